@@ -0,0 +1,243 @@
+import heapq
+from typing import List, Dict, Tuple, Optional, Union, Iterable, Set
+from models import Mall, Connector
+from compiled_graph import CompiledGraph, get_compiled_graph, get_reverse_graph
+
+# Alternatives may be at most MAX_STRETCH times as long as the shortest route, and may share at
+# most MAX_SIMILARITY of their length with any route already chosen
+MAX_STRETCH = 1.4
+MAX_SIMILARITY = 0.7
+
+class RouteOption:
+    def __init__(self, path: List[str], distance: float, connectors: List[str], connector_types: List[str]):
+        self.path = path  # Node IDs, as returned by find_shortest_path
+        self.distance = distance
+        self.connectors = connectors  # Names of the connectors ridden, in order
+        self.connector_types = connector_types  # Their types, in the same order
+
+    def __repr__(self):
+        via = f"via {', '.join(self.connectors)}" if self.connectors else "on one floor"
+        return f"Route {via} ({self.distance:.1f})"
+
+def find_alternative_routes(
+    mall: Mall,
+    start_shop_name: str,
+    end_shop_name: str,
+    k: int = 3,
+    accessibility_required: bool = False,
+    connector_types: Optional[Iterable[str]] = None,
+    prefer_connector_type: Optional[str] = None,
+    max_similarity: float = MAX_SIMILARITY,
+    max_stretch: float = MAX_STRETCH
+) -> Union[List[RouteOption], str]:
+    # Up to k loopless routes, shortest first, each sharing at most max_similarity of its length
+    # with every route before it. connector_types restricts floor changes to those connector
+    # types. With prefer_connector_type, routes that change floors only by that type come first
+    # (stretch measured against the best of them), followed by the other alternatives.
+    graph = get_compiled_graph(mall)
+    start_nodes = graph.shop_nodes(start_shop_name)
+    end_nodes = graph.shop_nodes(end_shop_name)
+    if not start_nodes or not end_nodes:
+        return "One or both shops are not in the mall."
+
+    allowed = set(connector_types) if connector_types is not None else None
+    searches = [edge_costs(graph, allowed)]
+    if prefer_connector_type is not None and (allowed is None or prefer_connector_type in allowed):
+        searches.insert(0, edge_costs(graph, {prefer_connector_type}))
+    chosen: List[Tuple[List[int], Dict[int, float]]] = []
+    for costs in searches:
+        _via_routes(graph, start_nodes, end_nodes, k, accessibility_required, costs, max_similarity, max_stretch, chosen)
+    if not chosen:
+        return "No path found between the shops."
+
+    options = []
+    entities = graph.entities
+    for nodes, route_edges in chosen:
+        # One entry per ride, however many floors it spans
+        connectors = []
+        for node, next_node in zip(nodes, nodes[1:]):
+            entity = entities[node]
+            if entity is entities[next_node] and isinstance(entity, Connector) and (not connectors or connectors[-1] is not entity):
+                connectors.append(entity)
+        options.append(RouteOption(
+            graph.to_node_ids(nodes),
+            sum(route_edges.values()),
+            [connector.name for connector in connectors],
+            [connector.connector_type for connector in connectors]
+        ))
+    return options
+
+def find_routes_by_connector_type(
+    mall: Mall,
+    start_shop_name: str,
+    end_shop_name: str,
+    accessibility_required: bool = False
+) -> Union[Dict[str, RouteOption], str]:
+    # Shortest route that changes floors only by each connector type ("via elevator", "via
+    # escalator", ...); types that cannot connect the shops are left out, and shops on the same
+    # floor reached without a connector give an empty dict
+    graph = get_compiled_graph(mall)
+    options = {}
+    for connector_type in sorted(get_connector_type_edges(graph)):
+        routes = find_alternative_routes(mall, start_shop_name, end_shop_name, 1, accessibility_required, [connector_type])
+        if isinstance(routes, str):
+            if routes.startswith("One or both"):
+                return routes
+            continue
+        if routes and routes[0].connectors:
+            options[connector_type] = routes[0]
+    return options
+
+def edge_costs(graph: CompiledGraph, connector_types: Optional[Set[str]] = None):
+    # Current weights per edge, with the vertical edges of connectors of other types closed
+    if connector_types is None:
+        return graph.weights
+    costs = list(graph.weights)
+    for connector_type, edges in get_connector_type_edges(graph).items():
+        if connector_type not in connector_types:
+            for edge in edges:
+                costs[edge] = float('inf')
+    return costs
+
+def get_connector_type_edges(graph: CompiledGraph) -> Dict[str, List[int]]:
+    # Vertical edges (between two floors of one connector) by connector type, cached on the graph
+    edges = graph.connector_type_edges
+    if edges is None:
+        edges = {}
+        entities, targets = graph.entities, graph.targets
+        for node in range(graph.node_count):
+            entity = entities[node]
+            if not isinstance(entity, Connector):
+                continue
+            for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+                if entities[targets[edge]] is entity:
+                    edges.setdefault(entity.connector_type, []).append(edge)
+        graph.connector_type_edges = edges
+    return edges
+
+def _via_routes(
+    graph: CompiledGraph,
+    start_nodes: List[int],
+    end_nodes: List[int],
+    k: int,
+    accessibility_required: bool,
+    costs,
+    max_similarity: float,
+    max_stretch: float,
+    chosen: List[Tuple[List[int], Dict[int, float]]]
+):
+    # Via-node method: one search tree out of the start shop and one into the end shop give, for
+    # every node v, the shortest route through v, so all candidates come from two searches.
+    # Candidates are taken in order of length, one per plateau (a stretch shared by both trees
+    # gives the same route through each of its nodes), and appended to chosen as
+    # (nodes, forward edge: weight) until it holds k routes.
+    forward_cost, forward_tree, best = _bounded_tree(
+        graph, None, costs, start_nodes, accessibility_required, set(end_nodes), max_stretch
+    )
+    if best == float('inf') or len(chosen) >= k:
+        return
+    limit = best * max_stretch
+    reverse = get_reverse_graph(graph)
+    backward_cost, backward_tree, _ = _bounded_tree(
+        reverse, reverse.forward_edges, costs, end_nodes, accessibility_required, None, max_stretch, limit
+    )
+
+    candidates = []
+    for node, cost in forward_cost.items():
+        other = backward_cost.get(node)
+        if other is None or cost + other > limit:
+            continue
+        # Inside a plateau: the route through the node's predecessor is the same route
+        link = forward_tree[node]
+        if link is not None and backward_tree.get(link[0]) == (node, link[1]):
+            continue
+        candidates.append((cost + other, node))
+    candidates.sort()
+
+    for total, via in candidates:
+        nodes, edges = _via_route(forward_tree, backward_tree, via)
+        if len(set(nodes)) != len(nodes):
+            continue
+        route_edges = {edge: costs[edge] for edge in edges}
+        if any(sum(weight for edge, weight in route_edges.items() if edge in other_edges) > max_similarity * total
+               for _, other_edges in chosen):
+            continue
+        chosen.append((nodes, route_edges))
+        if len(chosen) >= k:
+            return
+
+def _bounded_tree(
+    graph: CompiledGraph,
+    edge_map,
+    costs,
+    sources: List[int],
+    accessibility_required: bool,
+    targets: Optional[set],
+    max_stretch: float,
+    limit: float = float('inf')
+) -> Tuple[Dict[int, float], Dict[int, Optional[Tuple[int, int]]], float]:
+    # Dijkstra settling every node within limit, or, with targets, within max_stretch times the
+    # distance of the first target settled. Edges are priced through edge_map (reverse graph edge
+    # to forward edge) when given. Returns (cost of each settled node, tree link of each settled
+    # node as (previous node in the search, forward edge index) or None at sources, distance to
+    # the nearest target).
+    offsets, neighbors = graph.offsets, graph.targets
+    accessible = graph.accessible
+    inf = float('inf')
+    best = inf
+    distance: Dict[int, float] = {}
+    tree: Dict[int, Optional[Tuple[int, int]]] = {}
+    settled: Dict[int, float] = {}
+    heap = []
+    for source in sources:
+        distance[source] = 0
+        tree[source] = None
+        heap.append((0, source))
+    heapq.heapify(heap)
+
+    while heap:
+        cost_so_far, current_node = heapq.heappop(heap)
+        if current_node in settled or distance[current_node] < cost_so_far:
+            continue
+        if cost_so_far > limit:
+            break
+        settled[current_node] = cost_so_far
+        if targets is not None and best == inf and current_node in targets:
+            best = cost_so_far
+            limit = best * max_stretch
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = neighbors[edge]
+            if neighbor in settled:
+                continue
+            if accessibility_required and not accessible[neighbor]:
+                continue
+            forward = edge if edge_map is None else edge_map[edge]
+            new_cost = cost_so_far + costs[forward]
+            if new_cost < distance.get(neighbor, inf):
+                distance[neighbor] = new_cost
+                tree[neighbor] = (current_node, forward)
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    return settled, {node: tree[node] for node in settled}, best
+
+def _via_route(
+    forward_tree: Dict[int, Optional[Tuple[int, int]]],
+    backward_tree: Dict[int, Optional[Tuple[int, int]]],
+    via: int
+) -> Tuple[List[int], List[int]]:
+    # Nodes and forward edge indices of the tree route from a start node through via to an end node
+    nodes = [via]
+    edges = []
+    link = forward_tree[via]
+    while link is not None:
+        nodes.append(link[0])
+        edges.append(link[1])
+        link = forward_tree[link[0]]
+    nodes.reverse()
+    edges.reverse()
+    link = backward_tree[via]
+    while link is not None:
+        nodes.append(link[0])
+        edges.append(link[1])
+        link = backward_tree[link[0]]
+    return nodes, edges
@@ -0,0 +1,82 @@
+from typing import List, Dict, Tuple, Optional, Union
+from models import Mall
+from compiled_graph import CompiledGraph, get_compiled_graph
+from mall_pool import mall_process_pool, worker_state
+from pathfinding import shortest_path_tree
+
+# (distance, path) for a found route, (inf, message) otherwise, like find_shortest_path
+RouteResult = Tuple[float, Union[List[str], str]]
+
+def find_routes_from(
+    mall: Mall,
+    start_shop_name: str,
+    end_shop_names: List[str],
+    accessibility_required: bool = False
+) -> Dict[str, RouteResult]:
+    # One search tree from the start shop answers every destination
+    graph = get_compiled_graph(mall)
+    start_nodes = graph.shop_nodes(start_shop_name)
+    end_nodes = {end_shop_name: graph.shop_nodes(end_shop_name) for end_shop_name in end_shop_names}
+
+    results: Dict[str, RouteResult] = {}
+    if not start_nodes:
+        for end_shop_name in end_shop_names:
+            results[end_shop_name] = (float('inf'), "One or both shops are not in the mall.")
+        return results
+
+    all_end_nodes = [node for nodes in end_nodes.values() for node in nodes]
+    distance, predecessor = shortest_path_tree(graph, start_nodes, accessibility_required, targets=all_end_nodes)
+
+    for end_shop_name, nodes in end_nodes.items():
+        if not nodes:
+            results[end_shop_name] = (float('inf'), "One or both shops are not in the mall.")
+            continue
+        best_node = min(nodes, key=lambda node: distance[node])
+        if distance[best_node] == float('inf'):
+            results[end_shop_name] = (float('inf'), "No path found between the shops.")
+            continue
+        results[end_shop_name] = (distance[best_node], tree_path(graph, predecessor, best_node))
+    return results
+
+def tree_path(graph: CompiledGraph, predecessor: List[int], node: int) -> List[str]:
+    path = []
+    while node != -1:
+        path.append(node)
+        node = predecessor[node]
+    path.reverse()
+    return graph.to_node_ids(path)
+
+def find_routes(
+    mall: Mall,
+    pairs: List[Tuple[str, str]],
+    accessibility_required: bool = False,
+    processes: Optional[int] = None
+) -> List[RouteResult]:
+    # Routes for many (start, end) pairs, one search tree per distinct start shop.
+    # processes > 1 spreads the start shops over a process pool.
+    destinations: Dict[str, List[str]] = {}
+    for start_shop_name, end_shop_name in pairs:
+        destinations.setdefault(start_shop_name, []).append(end_shop_name)
+    groups = list(destinations.items())
+
+    if processes is not None and processes > 1 and len(groups) > 1:
+        with mall_process_pool(mall, processes) as executor:
+            chunksize = max(1, len(groups) // (processes * 4))
+            group_results = list(executor.map(
+                _worker_routes_from,
+                [start for start, _ in groups],
+                [ends for _, ends in groups],
+                [accessibility_required] * len(groups),
+                chunksize=chunksize
+            ))
+    else:
+        group_results = [
+            find_routes_from(mall, start_shop_name, end_shop_names, accessibility_required)
+            for start_shop_name, end_shop_names in groups
+        ]
+
+    by_start = {start_shop_name: results for (start_shop_name, _), results in zip(groups, group_results)}
+    return [by_start[start_shop_name][end_shop_name] for start_shop_name, end_shop_name in pairs]
+
+def _worker_routes_from(start_shop_name: str, end_shop_names: List[str], accessibility_required: bool) -> Dict[str, RouteResult]:
+    return find_routes_from(worker_state(), start_shop_name, end_shop_names, accessibility_required)
@@ -0,0 +1,202 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Dict
+from data_loader import load_mall_from_json, load_mall_from_dict
+from compiled_graph import get_compiled_graph
+from pathfinding import find_shortest_path, generate_instructions
+from synthetic_mall import generate_mall_data
+from main import COLD_START_TARGET_MS
+
+# Size tiers: generate_mall_data arguments for each
+TIERS = {
+    'small': {'floors': 2, 'rows': 3, 'columns': 6, 'shops_per_floor': 10, 'connectors': 3},
+    'medium': {'floors': 4, 'rows': 6, 'columns': 12, 'shops_per_floor': 40, 'connectors': 8},
+    'large': {'floors': 6, 'rows': 12, 'columns': 24, 'shops_per_floor': 150, 'connectors': 16},
+    'xlarge': {'floors': 10, 'rows': 20, 'columns': 40, 'shops_per_floor': 400, 'connectors': 32},
+}
+
+# Latency metrics compared by --compare, with the ratio above which they count as regressions
+REGRESSION_THRESHOLD = 1.2
+
+def percentile(samples: List[float], fraction: float) -> float:
+    # Nearest-rank percentile
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    # Latencies in milliseconds
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 4),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 4),
+        'max_ms': round(max(samples, default=0.0) * 1000, 4),
+    }
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def peak_memory(function, *args, **kwargs) -> int:
+    # Peak Python heap allocation in bytes while running function
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def cold_start(data_path: str, start_shop_name: str, end_shop_name: str, repeats: int = 5) -> dict:
+    # Wall time of the headless CLI in a fresh interpreter: imports, loading, routing and output
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'),
+               start_shop_name, end_shop_name, '--data', data_path, '--format', 'json']
+    times = []
+    for _ in range(repeats):
+        elapsed, _ = timed(subprocess.run, command, check=True, stdout=subprocess.DEVNULL)
+        times.append(elapsed)
+    return dict(summarize(times), target_ms=COLD_START_TARGET_MS)
+
+def benchmark_tier(name: str, config: dict, queries: int = 200, repeats: int = 5, seed: int = 0) -> dict:
+    data = generate_mall_data(seed=seed, **config)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(data, f)
+        data_path = f.name
+    try:
+        load_times = []
+        for _ in range(repeats):
+            elapsed, mall = timed(load_mall_from_json, data_path)
+            load_times.append(elapsed)
+        load_memory = peak_memory(load_mall_from_json, data_path)
+        file_size = os.path.getsize(data_path)
+        shop_names = sorted({shop.name for floor in mall.floors.values() for shop in floor.shops.values()})
+        cli = cold_start(data_path, shop_names[0], shop_names[-1], repeats)
+    finally:
+        os.remove(data_path)
+
+    build_times = []
+    unbuilt = load_mall_from_dict(data, build=False)
+    for _ in range(repeats):
+        elapsed, _ = timed(unbuilt.build_graph)
+        build_times.append(elapsed)
+    compile_time, graph = timed(get_compiled_graph, unbuilt)
+    mall = unbuilt
+
+    rng = random.Random(seed)
+    pairs = [(rng.choice(shop_names), rng.choice(shop_names)) for _ in range(queries)]
+
+    results = {}
+    for accessibility_required in (False, True):
+        route_times = []
+        instruction_times = []
+        expanded = []
+        found = 0
+        for start_shop_name, end_shop_name in pairs:
+            stats = {}
+            elapsed, path = timed(
+                find_shortest_path, mall, start_shop_name, end_shop_name, accessibility_required, stats=stats
+            )
+            route_times.append(elapsed)
+            expanded.append(stats.get('nodes_expanded', 0))
+            if isinstance(path, list):
+                found += 1
+                elapsed, _ = timed(generate_instructions, mall, path)
+                instruction_times.append(elapsed)
+        mode = 'accessible' if accessibility_required else 'any'
+        results[f"find_shortest_path[{mode}]"] = dict(
+            summarize(route_times),
+            found=found,
+            nodes_expanded_p50=percentile(expanded, 0.50),
+            nodes_expanded_p99=percentile(expanded, 0.99)
+        )
+        results[f"generate_instructions[{mode}]"] = summarize(instruction_times)
+
+    return {
+        'tier': name,
+        'config': config,
+        'nodes': graph.node_count,
+        'edges': len(graph.targets),
+        'shops': len(shop_names),
+        'file_bytes': file_size,
+        'load_mall_from_json': dict(summarize(load_times), peak_bytes=load_memory),
+        'build_graph': dict(summarize(build_times), peak_bytes=peak_memory(unbuilt.build_graph)),
+        'compile_graph_ms': round(compile_time * 1000, 4),
+        'cli_cold_start': cli,
+        **results,
+    }
+
+def run_benchmarks(tiers: List[str], queries: int = 200, repeats: int = 5, seed: int = 0) -> dict:
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'queries': queries,
+        'repeats': repeats,
+        'tiers': {},
+    }
+    for name in tiers:
+        if name not in TIERS:
+            raise ValueError(f"Unknown tier {name!r}; choose from {', '.join(TIERS)}")
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        report['tiers'][name] = benchmark_tier(name, TIERS[name], queries, repeats, seed)
+    return report
+
+def compare_reports(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    # One line per p50/p99 latency that grew by more than threshold x the baseline
+    regressions = []
+    for tier, metrics in current['tiers'].items():
+        baseline_metrics = baseline.get('tiers', {}).get(tier)
+        if baseline_metrics is None:
+            continue
+        for metric, values in metrics.items():
+            baseline_values = baseline_metrics.get(metric)
+            if not isinstance(values, dict) or not isinstance(baseline_values, dict):
+                continue
+            for key in ('p50_ms', 'p99_ms'):
+                old, new = baseline_values.get(key), values.get(key)
+                if old and new is not None and new > old * threshold:
+                    regressions.append(f"{tier} {metric} {key}: {old} -> {new} ({new / old:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Mall navigation benchmarks")
+    parser.add_argument("--tiers", default="small,medium,large", help=f"Comma-separated tiers from {', '.join(TIERS)}")
+    parser.add_argument("--queries", type=int, default=200, help="Random shop pairs per tier")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repeats of loading and graph building")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report; exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Regression ratio")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.tiers.split(','), args.queries, args.repeats, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        raise SystemExit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
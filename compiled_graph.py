@@ -0,0 +1,219 @@
+from array import array
+from collections.abc import Mapping
+from typing import List, Dict, Tuple, Optional, Union
+from models import Mall, Shop, Connector, CorridorNode
+
+# Entity kinds stored in CompiledGraph.kinds
+KIND_SHOP = 0
+KIND_CONNECTOR = 1
+KIND_CORRIDOR = 2
+
+class CompiledGraph:
+    # Dense, integer-indexed view of Mall.graph. Node i has its outgoing edges in
+    # targets[offsets[i]:offsets[i + 1]] / weights[offsets[i]:offsets[i + 1]] (CSR layout),
+    # and its position and metadata in the parallel per-node arrays.
+    def __init__(self):
+        self.node_ids: List[str] = []  # index: string node ID
+        self.index: Dict[str, int] = {}  # string node ID: index
+        self.entities: List[Union[Shop, Connector, CorridorNode]] = []  # index: entity
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        self.weights = array('d')  # Current weights; disabled edges are inf
+        self.base_weights = self.weights  # Weights as built, shared with weights until an edge is disabled
+        self.adjusted_weights = self.base_weights  # Weights with the mall's weight layer applied (see weight_layer.py)
+        self.xs = array('d')
+        self.ys = array('d')
+        self.levels = array('l')
+        self.kinds = array('b')
+        self.accessible = array('b')  # 0 for nodes that must be skipped on accessible routes
+        self.shop_index: Dict[str, List[int]] = {}  # case-folded shop name (as in ShopNameIndex): shop nodes
+        self.floor_weight = 0.0  # Cheapest vertical edge weight per floor travelled
+        self.forward_edges = array('l')  # Reverse graphs only: edge index in the graph they reverse
+        self.reverse: Optional['CompiledGraph'] = None  # Reverse adjacency, built on first use
+        self.descriptions: Optional[List[str]] = None  # index: describe_entity text, built on first use
+        self.instruction_templates: Dict[Tuple[int, int], str] = {}  # (turn kind, next node): instruction
+        self.connector_type_edges: Optional[Dict[str, List[int]]] = None  # connector type: vertical edges, built on first use
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def neighbors(self, node: int):
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def find_edges(self, node: int, neighbor: int) -> List[int]:
+        return [edge for edge in range(self.offsets[node], self.offsets[node + 1]) if self.targets[edge] == neighbor]
+
+    def set_edges_enabled(self, edges: List[Tuple[str, str]], enabled: bool) -> List[Tuple[int, int]]:
+        # Patch the weights of the given (from, to) node ID edges in place.
+        # Returns the edges that exist in this graph as (from, to) node pairs.
+        if self.weights is self.base_weights:
+            self.weights = array('d', self.base_weights)
+        changed = []
+        for from_id, to_id in edges:
+            node, neighbor = self.index.get(from_id), self.index.get(to_id)
+            if node is None or neighbor is None:
+                continue
+            for edge in self.find_edges(node, neighbor):
+                self.weights[edge] = self.adjusted_weights[edge] if enabled else float('inf')
+            changed.append((node, neighbor))
+        return changed
+
+    def affected_modes(self, edges: List[Tuple[int, int]]) -> List[bool]:
+        # Accessibility modes whose searchable graph contains any of the edges
+        modes = [False] if edges else []
+        if any(self.accessible[node] and self.accessible[neighbor] for node, neighbor in edges):
+            modes.append(True)
+        return modes
+
+    def shop_nodes(self, shop_name: str) -> List[int]:
+        # Nodes of every branch of the shop, matched with the same case folding as Mall.get_name_index
+        return self.shop_index.get(shop_name.casefold(), [])
+
+    def to_indices(self, node_ids: List[str]) -> List[int]:
+        return [self.index[node_id] for node_id in node_ids]
+
+    def to_node_ids(self, nodes: List[int]) -> List[str]:
+        return [self.node_ids[node] for node in nodes]
+
+    def __repr__(self):
+        return f"CompiledGraph with {self.node_count} nodes, {self.edge_count} edges"
+
+def compile_graph(mall: Mall) -> CompiledGraph:
+    compiled = CompiledGraph()
+
+    def add_node(node_id: str) -> int:
+        node = compiled.index.get(node_id)
+        if node is not None:
+            return node
+        entity = mall.get_entity_by_node_id(node_id)
+        if entity is None:
+            raise ValueError(f"Graph node {node_id!r} does not resolve to a mall entity")
+        level = int(node_id.split(' @ Level ')[-1])
+        if isinstance(entity, Shop):
+            kind = KIND_SHOP
+            accessible = True
+        elif isinstance(entity, Connector):
+            kind = KIND_CONNECTOR
+            accessible = entity.accessible
+        else:
+            kind = KIND_CORRIDOR
+            accessible = True
+        node = len(compiled.node_ids)
+        compiled.node_ids.append(node_id)
+        compiled.index[node_id] = node
+        compiled.entities.append(entity)
+        compiled.xs.append(entity.x)
+        compiled.ys.append(entity.y)
+        compiled.levels.append(level)
+        compiled.kinds.append(kind)
+        compiled.accessible.append(1 if accessible else 0)
+        if kind == KIND_SHOP:
+            compiled.shop_index.setdefault(entity.name.casefold(), []).append(node)
+        return node
+
+    # Number nodes in graph order first so that indices are stable across builds
+    for node_id in mall.graph:
+        add_node(node_id)
+    for node_id, edges in mall.graph.items():
+        for neighbor_id, _ in edges:
+            add_node(neighbor_id)
+
+    adjacency: List[List[tuple]] = [[] for _ in compiled.node_ids]
+    for node_id, edges in mall.graph.items():
+        node = compiled.index[node_id]
+        adjacency[node] = [(compiled.index[neighbor_id], weight) for neighbor_id, weight in edges]
+
+    for edges in adjacency:
+        for target, weight in edges:
+            compiled.targets.append(target)
+            compiled.weights.append(weight)
+        compiled.offsets.append(len(compiled.targets))
+    compiled.floor_weight = compute_floor_weight(compiled)
+    # Congestion only ever lengthens edges, so floor_weight stays a lower bound
+    if mall.weight_layer is not None:
+        mall.weight_layer.apply_to(compiled)
+    if mall.disabled_edges:
+        compiled.set_edges_enabled(list(mall.disabled_edges), False)
+    return compiled
+
+def compute_floor_weight(graph: CompiledGraph) -> float:
+    # Lower bound on the cost of changing floors, used by the A* heuristic
+    floor_weight = float('inf')
+    levels = graph.levels
+    for node in range(graph.node_count):
+        for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+            level_difference = abs(levels[graph.targets[edge]] - levels[node])
+            if level_difference:
+                floor_weight = min(floor_weight, graph.weights[edge] / level_difference)
+    return floor_weight if floor_weight != float('inf') else 0.0
+
+def reverse_graph(graph: CompiledGraph) -> CompiledGraph:
+    # Same nodes with every edge flipped; node arrays are shared with graph.
+    # weights is a snapshot, while forward_edges maps each edge back to graph's current weights.
+    reverse = CompiledGraph()
+    for name in ('node_ids', 'index', 'entities', 'xs', 'ys', 'levels', 'kinds', 'accessible', 'shop_index', 'floor_weight'):
+        setattr(reverse, name, getattr(graph, name))
+    incoming: List[List[tuple]] = [[] for _ in range(graph.node_count)]
+    for node in range(graph.node_count):
+        for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+            incoming[graph.targets[edge]].append((node, graph.weights[edge], edge))
+    reverse.offsets = array('l', [0])
+    reverse.base_weights = reverse.adjusted_weights = reverse.weights
+    for edges in incoming:
+        for source, weight, edge in edges:
+            reverse.targets.append(source)
+            reverse.weights.append(weight)
+            reverse.forward_edges.append(edge)
+        reverse.offsets.append(len(reverse.targets))
+    return reverse
+
+def get_reverse_graph(graph: CompiledGraph) -> CompiledGraph:
+    # Cached on graph; searches must read weights through forward_edges so closures apply
+    reverse = graph.reverse
+    if reverse is None:
+        reverse = graph.reverse = reverse_graph(graph)
+    return reverse
+
+class GraphView(Mapping):
+    # Read-only Mall.graph (node_id: [(connected_node_id, weight)], weights as built) served from
+    # a compiled graph, so that the dict of per-edge tuples does not have to be kept
+    def __init__(self, graph: CompiledGraph):
+        self.compiled = graph
+
+    def __getitem__(self, node_id: str) -> List[Tuple[str, float]]:
+        graph = self.compiled
+        node = graph.index[node_id]
+        node_ids, targets, weights = graph.node_ids, graph.targets, graph.base_weights
+        return [(node_ids[targets[edge]], weights[edge]) for edge in range(graph.offsets[node], graph.offsets[node + 1])]
+
+    def __iter__(self):
+        return iter(self.compiled.node_ids)
+
+    def __len__(self) -> int:
+        return self.compiled.node_count
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self.compiled.index
+
+    def __repr__(self):
+        return f"GraphView of {self.compiled!r}"
+
+def compact_mall(mall: Mall) -> Mall:
+    # Compile the graph and replace Mall.graph with a view of it. Everything keeps working
+    # until the next build_graph, which builds a fresh dict graph again.
+    mall.graph = GraphView(get_compiled_graph(mall))
+    return mall
+
+def get_compiled_graph(mall: Mall) -> CompiledGraph:
+    # Compile lazily and keep the result on the mall until the next build_graph
+    compiled: Optional[CompiledGraph] = mall.compiled_graph
+    if compiled is None:
+        compiled = compile_graph(mall)
+        mall.compiled_graph = compiled
+    return compiled
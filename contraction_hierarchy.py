@@ -0,0 +1,383 @@
+import heapq
+import random
+import threading
+from typing import List, Dict, Tuple, Optional
+from models import Mall
+from compiled_graph import CompiledGraph, get_compiled_graph
+from data_loader import load_mall_from_dict
+from pathfinding import shortest_path_tree
+from synthetic_mall import generate_mall_data
+
+# Witness search depth used when estimating contraction priorities
+PRIORITY_SETTLE_LIMIT = 8
+
+class ContractionHierarchy:
+    # Contraction hierarchy over one routing mode of a CompiledGraph. Nodes are contracted
+    # in rank order; upward_forward[v] holds edges v -> w and upward_backward[v] holds
+    # reversed edges u -> v, both only towards higher-ranked nodes. Shortcuts remember the
+    # contracted node they bypass in middle so that paths can be unpacked.
+    def __init__(self, graph: CompiledGraph, accessibility_required: bool = False, witness_settle_limit: int = 60):
+        self.graph = graph
+        self.accessibility_required = accessibility_required
+        self.witness_settle_limit = witness_settle_limit
+        self.rank: List[int] = [0] * graph.node_count
+        self.upward_forward: List[List[Tuple[int, float]]] = [[] for _ in range(graph.node_count)]
+        self.upward_backward: List[List[Tuple[int, float]]] = [[] for _ in range(graph.node_count)]
+        self.middle: Dict[Tuple[int, int], int] = {}  # (from, to): contracted node bypassed by the shortcut
+        self.shortcut_count = 0
+        self._contract()
+
+    def _contract(self):
+        graph = self.graph
+        node_count = graph.node_count
+        usable = [not self.accessibility_required or graph.accessible[node] for node in range(node_count)]
+
+        # Remaining (uncontracted) graph, parallel edges collapsed to the lightest one
+        out_edges: List[Dict[int, float]] = [{} for _ in range(node_count)]
+        in_edges: List[Dict[int, float]] = [{} for _ in range(node_count)]
+        for node in range(node_count):
+            if not usable[node]:
+                continue
+            for neighbor, weight in graph.neighbors(node):
+                if neighbor == node or not usable[neighbor]:
+                    continue
+                if weight < out_edges[node].get(neighbor, float('inf')):
+                    out_edges[node][neighbor] = weight
+                    in_edges[neighbor][node] = weight
+
+        contracted_neighbors = [0] * node_count
+
+        def find_shortcuts(node: int, settle_limit: int) -> List[Tuple[int, int, float]]:
+            shortcuts = []
+            outgoing = out_edges[node]
+            if not outgoing:
+                return shortcuts
+            for source, in_weight in in_edges[node].items():
+                candidates = [(target, weight) for target, weight in outgoing.items() if target != source]
+                if not candidates:
+                    continue
+                max_cost = in_weight + max(weight for _, weight in candidates)
+                witness = self._witness_search(
+                    out_edges, source, node, max_cost, {target for target, _ in candidates}, settle_limit
+                )
+                for target, out_weight in candidates:
+                    cost = in_weight + out_weight
+                    if witness.get(target, float('inf')) > cost:
+                        shortcuts.append((source, target, cost))
+            return shortcuts
+
+        def edge_difference(node: int, shortcuts: List[Tuple[int, int, float]]) -> int:
+            # Edge difference plus a term that spreads contraction evenly over the graph
+            return len(shortcuts) - len(in_edges[node]) - len(out_edges[node]) + contracted_neighbors[node]
+
+        # Priorities come from a cheap, shallow witness search; only the actual contraction
+        # runs the full witness_settle_limit search
+        heap = [(edge_difference(node, find_shortcuts(node, PRIORITY_SETTLE_LIMIT)), node) for node in range(node_count)]
+        heapq.heapify(heap)
+        contracted = bytearray(node_count)
+        next_rank = 0
+
+        while heap:
+            _, node = heapq.heappop(heap)
+            if contracted[node]:
+                continue
+            # Lazy update: re-evaluate and defer if the node is no longer the cheapest
+            current_priority = edge_difference(node, find_shortcuts(node, PRIORITY_SETTLE_LIMIT))
+            if heap and current_priority > heap[0][0]:
+                heapq.heappush(heap, (current_priority, node))
+                continue
+
+            for source, target, cost in find_shortcuts(node, self.witness_settle_limit):
+                if cost < out_edges[source].get(target, float('inf')):
+                    out_edges[source][target] = cost
+                    in_edges[target][source] = cost
+                    self.middle[(source, target)] = node
+                    self.shortcut_count += 1
+
+            self.rank[node] = next_rank
+            next_rank += 1
+            contracted[node] = 1
+
+            # Edges to the remaining nodes point upwards in the hierarchy
+            for target, weight in out_edges[node].items():
+                self.upward_forward[node].append((target, weight))
+                del in_edges[target][node]
+                contracted_neighbors[target] += 1
+            for source, weight in in_edges[node].items():
+                self.upward_backward[node].append((source, weight))
+                del out_edges[source][node]
+                contracted_neighbors[source] += 1
+            out_edges[node] = {}
+            in_edges[node] = {}
+
+    def _witness_search(
+        self,
+        out_edges: List[Dict[int, float]],
+        source: int,
+        excluded: int,
+        max_cost: float,
+        targets: set,
+        settle_limit: int
+    ) -> Dict[int, float]:
+        # Bounded Dijkstra from source that avoids the node being contracted.
+        # Stops once every target is settled, max_cost is exceeded or settle_limit is hit.
+        distance = {source: 0}
+        heap = [(0, source)]
+        settled = 0
+        remaining = len(targets)
+        while heap and settled < settle_limit:
+            cost_so_far, current_node = heapq.heappop(heap)
+            if cost_so_far > distance[current_node]:
+                continue
+            if cost_so_far > max_cost:
+                break
+            settled += 1
+            if current_node in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            for neighbor, weight in out_edges[current_node].items():
+                if neighbor == excluded:
+                    continue
+                new_cost = cost_so_far + weight
+                if new_cost < distance.get(neighbor, float('inf')):
+                    distance[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return distance
+
+    def query(self, start_nodes: List[int], end_nodes) -> Optional[Tuple[float, List[int]]]:
+        # Bidirectional upward Dijkstra; returns (distance, unpacked path) or None if unreachable
+        forward_distance = {node: 0 for node in start_nodes}
+        backward_distance = {node: 0 for node in end_nodes}
+        forward_parent = {node: None for node in start_nodes}
+        backward_parent = {node: None for node in end_nodes}
+        forward_heap = [(0, node) for node in start_nodes]
+        backward_heap = [(0, node) for node in end_nodes]
+        best_distance = float('inf')
+        meeting_node = None
+        for node in forward_distance:
+            if node in backward_distance:
+                best_distance, meeting_node = 0, node
+                break
+
+        searches = (
+            (forward_heap, forward_distance, forward_parent, backward_distance, self.upward_forward),
+            (backward_heap, backward_distance, backward_parent, forward_distance, self.upward_backward)
+        )
+        while (forward_heap and forward_heap[0][0] < best_distance) or \
+                (backward_heap and backward_heap[0][0] < best_distance):
+            for heap, distance, parent, other_distance, upward in searches:
+                if not heap or heap[0][0] >= best_distance:
+                    continue
+                cost_so_far, current_node = heapq.heappop(heap)
+                if cost_so_far > distance[current_node]:
+                    continue
+                for neighbor, weight in upward[current_node]:
+                    new_cost = cost_so_far + weight
+                    if new_cost < distance.get(neighbor, float('inf')):
+                        distance[neighbor] = new_cost
+                        parent[neighbor] = current_node
+                        heapq.heappush(heap, (new_cost, neighbor))
+                        if neighbor in other_distance and new_cost + other_distance[neighbor] < best_distance:
+                            best_distance = new_cost + other_distance[neighbor]
+                            meeting_node = neighbor
+
+        if meeting_node is None:
+            return None
+
+        # Shortcut-level path: start ... meeting node ... end
+        upward_path = []
+        node = meeting_node
+        while node is not None:
+            upward_path.append(node)
+            node = forward_parent[node]
+        upward_path.reverse()
+        node = backward_parent[meeting_node]
+        while node is not None:
+            upward_path.append(node)
+            node = backward_parent[node]
+
+        path = [upward_path[0]]
+        for source, target in zip(upward_path, upward_path[1:]):
+            self._unpack_edge(source, target, path)
+        return best_distance, path
+
+    def many_to_many(self, sources: List[int], targets: List[int]) -> List[List[float]]:
+        # Distance matrix by the bucket method: one upward search backwards from each target
+        # leaves (target, distance) in a bucket at every node it reaches, then one upward search
+        # forwards from each source joins against the buckets. Unreachable pairs are inf.
+        buckets: Dict[int, List[Tuple[int, float]]] = {}
+        for column, target in enumerate(targets):
+            for node, distance in self._upward_search(target, self.upward_backward).items():
+                buckets.setdefault(node, []).append((column, distance))
+        matrix = []
+        for source in sources:
+            row = [float('inf')] * len(targets)
+            for node, distance in self._upward_search(source, self.upward_forward).items():
+                for column, target_distance in buckets.get(node, ()):
+                    if distance + target_distance < row[column]:
+                        row[column] = distance + target_distance
+            matrix.append(row)
+        return matrix
+
+    def _upward_search(self, source: int, upward: List[List[Tuple[int, float]]]) -> Dict[int, float]:
+        # Complete Dijkstra over the upward edges from source
+        distance = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            cost_so_far, current_node = heapq.heappop(heap)
+            if cost_so_far > distance[current_node]:
+                continue
+            for neighbor, weight in upward[current_node]:
+                new_cost = cost_so_far + weight
+                if new_cost < distance.get(neighbor, float('inf')):
+                    distance[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return distance
+
+    def _unpack_edge(self, source: int, target: int, path: List[int]):
+        # Append the original nodes of edge source -> target (excluding source) to path
+        stack = [(source, target)]
+        while stack:
+            edge_source, edge_target = stack.pop()
+            node = self.middle.get((edge_source, edge_target))
+            if node is None:
+                path.append(edge_target)
+            else:
+                stack.append((node, edge_target))
+                stack.append((edge_source, node))
+
+    def __repr__(self):
+        return f"ContractionHierarchy with {self.graph.node_count} nodes, {self.shortcut_count} shortcuts"
+
+def build_contraction_hierarchies(mall: Mall) -> Dict[bool, ContractionHierarchy]:
+    # One hierarchy per accessibility mode; find_shortest_path uses them until the next build_graph
+    graph = get_compiled_graph(mall)
+    hierarchies = {
+        accessibility_required: ContractionHierarchy(graph, accessibility_required)
+        for accessibility_required in (False, True)
+    }
+    mall.contraction_hierarchies = hierarchies
+    return hierarchies
+
+class HierarchyRebuilder:
+    # Keeps mall.contraction_hierarchies built for modes on a background thread: once when
+    # started, and again whenever a closure, weight layer or schedule update drops a hierarchy
+    # (Mall._edges_reweighted calls schedule). Until a hierarchy is back, find_shortest_path and
+    # plan_tour search without it. Like the hierarchies, it stops at the next build_graph.
+    def __init__(self, mall: Mall, modes: Tuple[bool, ...] = (False, True)):
+        self.mall = mall
+        self.modes = modes
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = False
+
+    def schedule(self):
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="HierarchyRebuilder", daemon=True)
+                self._thread.start()
+
+    def wait(self):
+        # Block until no build is pending or running
+        while True:
+            with self._lock:
+                thread = self._thread
+            if thread is None:
+                return
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+            mall = self.mall
+            if mall.hierarchy_rebuilder is not self or mall.compiled_graph is None:
+                continue
+            for mode in self.modes:
+                version, graph = mall.graph_version, mall.compiled_graph
+                if graph is None or mode in (mall.contraction_hierarchies or {}):
+                    continue
+                hierarchy = ContractionHierarchy(graph, mode)
+                # Every change bumps graph_version before it drops the hierarchies, so a build
+                # that overlapped a change is discarded here or dropped by the change itself;
+                # the change also scheduled the next build
+                if mall.graph_version != version or mall.compiled_graph is not graph:
+                    continue
+                if mall.contraction_hierarchies is None:
+                    mall.contraction_hierarchies = {}
+                mall.contraction_hierarchies[mode] = hierarchy
+                if mall.graph_version != version and mall.contraction_hierarchies.get(mode) is hierarchy:
+                    del mall.contraction_hierarchies[mode]
+
+    def __repr__(self):
+        return f"HierarchyRebuilder for modes {self.modes}{' (building)' if self._thread is not None else ''}"
+
+def keep_contraction_hierarchies(mall: Mall, modes: Tuple[bool, ...] = (False, True)) -> HierarchyRebuilder:
+    # Build the hierarchies for modes in the background and rebuild them after every change.
+    # Call wait() on the result to block until they are ready, e.g. at load time.
+    get_compiled_graph(mall)
+    rebuilder = mall.hierarchy_rebuilder = HierarchyRebuilder(mall, modes)
+    rebuilder.schedule()
+    return rebuilder
+
+def check_against_dijkstra(malls: int = 20, queries: int = 50, seed: int = 0) -> int:
+    # Compare hierarchy routes with plain Dijkstra on random synthetic malls.
+    # Returns the number of mismatching queries after printing each one.
+    rng = random.Random(seed)
+    mismatches = 0
+    for mall_index in range(malls):
+        data = generate_mall_data(
+            floors=rng.randint(1, 4),
+            rows=rng.randint(1, 5),
+            columns=rng.randint(2, 7),
+            shops_per_floor=rng.randint(1, 6),
+            connectors=rng.randint(1, 5),
+            edge_keep=rng.choice([1.0, 0.9, 0.7]),
+            seed=rng.randrange(1 << 30)
+        )
+        mall = load_mall_from_dict(data)
+        graph = get_compiled_graph(mall)
+        hierarchies = build_contraction_hierarchies(mall)
+        shop_names = sorted({shop.name for floor in mall.floors.values() for shop in floor.shops.values()})
+        for _ in range(queries):
+            start_name, end_name = rng.choice(shop_names), rng.choice(shop_names)
+            accessibility_required = rng.random() < 0.5
+            start_nodes = graph.to_indices(mall.get_shop_node_ids(start_name))
+            end_nodes = graph.to_indices(mall.get_shop_node_ids(end_name))
+
+            distance, _ = shortest_path_tree(graph, start_nodes, accessibility_required)
+            expected = min(distance[node] for node in end_nodes)
+            result = hierarchies[accessibility_required].query(start_nodes, end_nodes)
+            if result is None:
+                ok = expected == float('inf')
+            else:
+                # The unpacked path must be a real route of the reported length
+                route_distance, path = result
+                ok = (
+                    abs(route_distance - expected) < 1e-6
+                    and path[0] in start_nodes and path[-1] in end_nodes
+                    and abs(path_length(graph, path, accessibility_required) - expected) < 1e-6
+                )
+            if not ok:
+                mismatches += 1
+                print(f"Mismatch in mall {mall_index}: {start_name} -> {end_name} "
+                      f"(accessible={accessibility_required}): expected {expected}, got {result}")
+    return mismatches
+
+def path_length(graph: CompiledGraph, path: List[int], accessibility_required: bool = False) -> float:
+    total = 0
+    for source, target in zip(path, path[1:]):
+        if accessibility_required and not graph.accessible[target]:
+            return float('inf')
+        total += min((weight for neighbor, weight in graph.neighbors(source) if neighbor == target), default=float('inf'))
+    return total
+
+if __name__ == "__main__":
+    failures = check_against_dijkstra()
+    print(f"{failures} mismatches")
+    raise SystemExit(1 if failures else 0)
@@ -1,97 +1,225 @@
 import json
 import difflib
 from models import Mall, Floor, Shop, Connector, Corridor, CorridorNode
-from typing import Dict
+from route_table import precompute_route_table
+from landmarks import build_landmarks
+from typing import List, Dict, Optional, Iterable, Callable
+from collections import Counter
 
-def load_mall_from_json(file_path: str) -> Mall:
+def load_mall_from_json(file_path: str, precompute_routes: bool = False, landmark_count: int = 0) -> Mall:
     with open(file_path, 'r') as f:
         data = json.load(f)
-    mall = Mall()
-    floor_objects: Dict[int, Floor] = {}
-    connectors: Dict[str, Connector] = {}
+    return load_mall_from_dict(data, precompute_routes=precompute_routes, landmark_count=landmark_count)
+
+def load_mall_from_dict(data: dict, precompute_routes: bool = False, build: bool = True, landmark_count: int = 0) -> Mall:
+    # Same schema as mall_data.json; build=False leaves the graph empty
+    builder = MallBuilder()
+    for i, connector_data in enumerate(data.get('connectors', [])):
+        builder.add_connector(connector_data, f"connectors[{i}]")
+    for i, floor_data in enumerate(data['floors']):
+        builder.add_floor(floor_data, f"floors[{i}]")
+    mall = builder.finish()
+    for diagnostic in builder.diagnostics:
+        print(f"Warning: {diagnostic.message}")
+    return finish_loading(mall, precompute_routes, build, landmark_count)
+
+def finish_loading(mall: Mall, precompute_routes: bool = False, build: bool = True, landmark_count: int = 0) -> Mall:
+    # Build the graph
+    if not build:
+        return mall
+    mall.build_graph()
+    if precompute_routes:
+        precompute_route_table(mall)
+    if landmark_count:
+        build_landmarks(mall, landmark_count)
+    return mall
 
-    # Create floors
-    for floor_data in data['floors']:
-        level = floor_data['level']
+class LoadDiagnostic:
+    def __init__(self, severity: str, code: str, message: str, location: str):
+        self.severity = severity  # 'error' for dropped data, 'warning' for data kept with a caveat
+        self.code = code  # e.g. 'unknown_corridor_node', 'unknown_connector', 'missing_field'
+        self.message = message
+        self.location = location  # Path into the document, e.g. floors[0].corridors[1].connections[3]
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'severity': self.severity, 'code': self.code, 'message': self.message, 'location': self.location}
+
+    def __repr__(self):
+        return f"{self.severity} {self.code} at {self.location}: {self.message}"
+
+class MallBuilder:
+    # Builds a Mall one floor at a time, in the mall_data.json schema. Connectors may be added
+    # before or after the floors that list them; references that never resolve, and entries with
+    # missing fields, are dropped and recorded in diagnostics instead of raising.
+    # levels / floor_filter restrict loading to some floors; floor_filter receives the floor data.
+    def __init__(self, levels: Optional[Iterable[int]] = None, floor_filter: Optional[Callable[[dict], bool]] = None):
+        self.mall = Mall()
+        self.levels = set(levels) if levels is not None else None
+        self.floor_filter = floor_filter
+        self.connectors: Dict[str, Connector] = {}  # name: connector, defined or only referenced so far
+        self.connector_locations: Dict[str, str] = {}  # name: location of its definition
+        self.references: Dict[str, List[str]] = {}  # connector name: locations of floor references
+        self.diagnostics: List[LoadDiagnostic] = []
+
+    def add_connector(self, connector_data: dict, location: str = 'connectors[]'):
+        name = connector_data.get('name')
+        if name is None:
+            self._report('error', 'missing_field', "Connector without a name", location)
+            return
+        if name in self.connector_locations:
+            self._report('warning', 'duplicate_connector', f"Connector {name} is defined again", location)
+        # A floor may already hold a placeholder for this name; fill it in place
+        connector = self.connectors.setdefault(name, Connector(name=name))
+        connector.connector_type = connector_data.get('type', 'elevator')
+        connector.accessible = connector_data.get('accessible', True)
+        connector.direction = connector_data.get('direction', 'both')
+        connector.x = connector_data.get('x', 0)
+        connector.y = connector_data.get('y', 0)
+        self.connector_locations[name] = location
+
+    def add_floor(self, floor_data: dict, location: str = 'floors[]') -> Optional[Floor]:
+        # Returns the new floor, or None when it is filtered out or invalid
+        level = floor_data.get('level')
+        if level is None:
+            self._report('error', 'missing_field', "Floor without a level", location)
+            return None
+        if self.levels is not None and level not in self.levels:
+            return None
+        if self.floor_filter is not None and not self.floor_filter(floor_data):
+            return None
+        if level in self.mall.floors:
+            self._report('error', 'duplicate_floor', f"Floor {level} is defined again", location)
+            return None
         floor = Floor(level=level)
-        mall.add_floor(floor)
-        floor_objects[level] = floor
-
-    # Create connectors
-    for connector_data in data.get('connectors', []):
-        name = connector_data['name']
-        connector = Connector(
-            name=name,
-            connector_type=connector_data.get('type', 'elevator'),
-            accessible=connector_data.get('accessible', True),
-            direction=connector_data.get('direction', 'both'),
-            x=connector_data.get('x', 0),
-            y=connector_data.get('y', 0)
-        )
-        connectors[name] = connector
-
-    # Assign connectors to floors
-    for floor_data in data['floors']:
-        level = floor_data['level']
-        floor = floor_objects[level]
-        for conn_name in floor_data.get('connectors', []):
-            connector = connectors.get(conn_name)
-            if connector:
-                connector.floors.append(floor)
-                floor.connectors[conn_name] = connector
-
-    # First, load all corridor nodes
-    for floor_data in data['floors']:
-        level = floor_data['level']
-        floor = floor_objects[level]
-        for corridor_data in floor_data.get('corridors', []):
-            for node_data in corridor_data['nodes']:
-                node = CorridorNode(
-                    id=node_data['id'],
-                    x=node_data['x'],
-                    y=node_data['y'],
-                    floor=floor
-                )
+        self.mall.add_floor(floor)
+
+        # Assign connectors to floors
+        for i, conn_name in enumerate(floor_data.get('connectors', [])):
+            connector = self.connectors.setdefault(conn_name, Connector(name=conn_name))
+            connector.floors.append(floor)
+            floor.connectors[conn_name] = connector
+            self.references.setdefault(conn_name, []).append(f"{location}.connectors[{i}]")
+
+        # First, load all corridor nodes, since connections may cross corridors
+        corridors = floor_data.get('corridors', [])
+        for i, corridor_data in enumerate(corridors):
+            for j, node_data in enumerate(corridor_data.get('nodes', [])):
+                node_location = f"{location}.corridors[{i}].nodes[{j}]"
+                if any(field not in node_data for field in ('id', 'x', 'y')):
+                    self._report('error', 'missing_field', f"Corridor node needs id, x and y on floor {level}", node_location)
+                    continue
+                if node_data['id'] in floor.corridor_nodes:
+                    self._report('warning', 'duplicate_node', f"Corridor node {node_data['id']} is defined again on floor {level}", node_location)
+                node = CorridorNode(id=node_data['id'], x=node_data['x'], y=node_data['y'], floor=floor)
                 floor.corridor_nodes[node.id] = node
 
-    # Then, process corridors and their connections
-    for floor_data in data['floors']:
-        level = floor_data['level']
-        floor = floor_objects[level]
-        for corridor_data in floor_data.get('corridors', []):
-            corridor_nodes = [floor.corridor_nodes[node_data['id']] for node_data in corridor_data['nodes']]
-            corridor = Corridor(
-                id=corridor_data['id'],
-                floor=floor,
-                nodes=corridor_nodes
-            )
-            floor.corridors[corridor.id] = corridor
+        # Then, process corridors and their connections
+        for i, corridor_data in enumerate(corridors):
+            corridor_location = f"{location}.corridors[{i}]"
+            corridor_nodes = [
+                floor.corridor_nodes[node_data['id']] for node_data in corridor_data.get('nodes', [])
+                if node_data.get('id') in floor.corridor_nodes
+            ]
+            corridor_id = corridor_data.get('id')
+            if corridor_id is None:
+                self._report('warning', 'missing_field', f"Corridor without an id on floor {level}", corridor_location)
+                corridor_id = f"corridor{i + 1}"
+            floor.corridors[corridor_id] = Corridor(id=corridor_id, floor=floor, nodes=corridor_nodes)
             # Connect corridor nodes
-            for conn in corridor_data.get('connections', []):
-                from_node = floor.corridor_nodes.get(conn['from'])
-                to_node = floor.corridor_nodes.get(conn['to'])
+            for j, conn in enumerate(corridor_data.get('connections', [])):
+                from_node = floor.corridor_nodes.get(conn.get('from'))
+                to_node = floor.corridor_nodes.get(conn.get('to'))
                 if from_node and to_node:
                     from_node.connections.append(to_node)
                     to_node.connections.append(from_node)
                 else:
-                    print(f"Warning: Could not find nodes {conn['from']} or {conn['to']} on floor {floor.level}")
+                    self._report(
+                        'error', 'unknown_corridor_node',
+                        f"Could not find nodes {conn.get('from')} or {conn.get('to')} on floor {level}",
+                        f"{corridor_location}.connections[{j}]"
+                    )
 
-    # Create shops
-    for floor_data in data['floors']:
-        level = floor_data['level']
-        floor = floor_objects[level]
-        for shop_data in floor_data.get('shops', []):
+        # Create shops
+        for i, shop_data in enumerate(floor_data.get('shops', [])):
+            shop_location = f"{location}.shops[{i}]"
+            if 'name' not in shop_data:
+                self._report('error', 'missing_field', f"Shop without a name on floor {level}", shop_location)
+                continue
+            if shop_data['name'] in floor.shops:
+                self._report('warning', 'duplicate_shop', f"Shop {shop_data['name']} is defined again on floor {level}", shop_location)
             shop = Shop(
-                name=shop_data['name'],
-                floor=floor,
-                x=shop_data.get('x', 0),
-                y=shop_data.get('y', 0)
+                name=shop_data['name'], floor=floor, x=shop_data.get('x', 0), y=shop_data.get('y', 0),
+                width=shop_data.get('width'), depth=shop_data.get('depth'), height=shop_data.get('height')
             )
             floor.shops[shop.name] = shop
+        return floor
 
-    # Build the graph
-    mall.build_graph()
-    return mall
+    def finish(self) -> Mall:
+        # Drop floor references to connectors that were never defined
+        for name, locations in self.references.items():
+            if name in self.connector_locations:
+                continue
+            for location in locations:
+                self._report('error', 'unknown_connector', f"Unknown connector {name}", location)
+            for floor in self.connectors[name].floors:
+                del floor.connectors[name]
+        return self.mall
+
+    def _report(self, severity: str, code: str, message: str, location: str):
+        self.diagnostics.append(LoadDiagnostic(severity, code, message, location))
+
+def shop_to_dict(shop: Shop) -> dict:
+    data = {'name': shop.name, 'x': shop.x, 'y': shop.y}
+    for field in ('width', 'depth', 'height'):
+        if getattr(shop, field) is not None:
+            data[field] = getattr(shop, field)
+    return data
+
+def mall_to_dict(mall: Mall) -> dict:
+    # Inverse of load_mall_from_dict
+    data = {'floors': [], 'connectors': []}
+    connectors: Dict[str, Connector] = {}
+    for floor in mall.floors.values():
+        corridors = [
+            {
+                'id': corridor.id,
+                'nodes': [{'id': node.id, 'x': node.x, 'y': node.y} for node in corridor.nodes],
+                'connections': []
+            }
+            for corridor in floor.corridors.values()
+        ]
+        corridor_of_node = {}
+        for corridor_data in corridors:
+            for node_data in corridor_data['nodes']:
+                corridor_of_node.setdefault(node_data['id'], corridor_data)
+        # Connections are stored on both nodes; emit each pair once, keeping duplicates
+        pending = Counter()
+        for node in floor.corridor_nodes.values():
+            for connected_node in node.connections:
+                if pending[(connected_node.id, node.id)]:
+                    pending[(connected_node.id, node.id)] -= 1
+                    continue
+                pending[(node.id, connected_node.id)] += 1
+                corridor_data = corridor_of_node.get(node.id, corridors[0] if corridors else None)
+                if corridor_data is not None:
+                    corridor_data['connections'].append({'from': node.id, 'to': connected_node.id})
+        data['floors'].append({
+            'level': floor.level,
+            'shops': [shop_to_dict(shop) for shop in floor.shops.values()],
+            'connectors': list(floor.connectors),
+            'corridors': corridors
+        })
+        connectors.update(floor.connectors)
+    for connector in connectors.values():
+        data['connectors'].append({
+            'name': connector.name,
+            'type': connector.connector_type,
+            'accessible': connector.accessible,
+            'direction': connector.direction,
+            'x': connector.x,
+            'y': connector.y
+        })
+    return data
 
 def add_connection(entity, connected_entity, level):
     if isinstance(entity, Shop):
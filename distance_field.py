@@ -0,0 +1,63 @@
+import numpy as np
+from typing import List, Tuple, Union
+from models import Mall
+from compiled_graph import CompiledGraph, get_compiled_graph
+from pathfinding import shortest_path_tree
+
+def resolve_sources(mall: Mall, graph: CompiledGraph, sources: Union[str, List[str]]) -> List[int]:
+    # Sources may be shop names (every entrance node of the shop) or graph node IDs
+    if isinstance(sources, str):
+        sources = [sources]
+    nodes = []
+    for source in sources:
+        node = graph.index.get(source)
+        if node is not None:
+            nodes.append(node)
+            continue
+        shop_nodes = graph.shop_nodes(source)
+        if not shop_nodes:
+            raise ValueError(f"{source!r} is neither a shop nor a graph node")
+        nodes.extend(shop_nodes)
+    return nodes
+
+def distance_field(
+    mall: Mall,
+    sources: Union[str, List[str]],
+    accessibility_required: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    # One Dijkstra sweep from all sources together. Returns (distances, predecessors) indexed
+    # by compiled node (get_compiled_graph(mall).node_ids): the distance from the nearest source,
+    # inf where unreachable, and the previous node on that route, -1 at sources and unreached nodes.
+    graph = get_compiled_graph(mall)
+    distance, predecessor = shortest_path_tree(graph, resolve_sources(mall, graph, sources), accessibility_required)
+    return np.array(distance, dtype=np.float64), np.array(predecessor, dtype=np.int64)
+
+def distance_fields(
+    mall: Mall,
+    sources: List[str],
+    accessibility_required: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    # One sweep per source. Returns (distances, predecessors) of shape (len(sources), node count);
+    # row i is distance_field(mall, sources[i], accessibility_required).
+    graph = get_compiled_graph(mall)
+    distances = np.empty((len(sources), graph.node_count), dtype=np.float64)
+    predecessors = np.empty((len(sources), graph.node_count), dtype=np.int64)
+    for row, source in enumerate(sources):
+        distance, predecessor = shortest_path_tree(graph, resolve_sources(mall, graph, source), accessibility_required)
+        distances[row] = distance
+        predecessors[row] = predecessor
+    return distances, predecessors
+
+def field_path(mall: Mall, predecessors: np.ndarray, node_id: str) -> List[str]:
+    # Route from the nearest source to node_id, read from a predecessor array;
+    # just [node_id] for sources and unreached nodes
+    graph = get_compiled_graph(mall)
+    node = graph.index.get(node_id)
+    if node is None:
+        raise ValueError(f"Unknown graph node {node_id!r}")
+    path = [node]
+    while predecessors[node] != -1:
+        node = int(predecessors[node])
+        path.append(node)
+    path.reverse()
+    return graph.to_node_ids(path)
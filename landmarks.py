@@ -0,0 +1,92 @@
+from array import array
+from typing import List, Dict, Callable
+from models import Mall
+from compiled_graph import CompiledGraph, get_compiled_graph, reverse_graph
+from pathfinding import shortest_path_tree
+
+class Landmarks:
+    # ALT (A*, landmarks, triangle inequality) lower bounds for one routing mode.
+    # from_landmark[i][v] is the distance from landmark i to node v and to_landmark[i][v]
+    # the distance from v back to landmark i, so for any target t
+    #   d(v, t) >= from_landmark[i][t] - from_landmark[i][v]
+    #   d(v, t) >= to_landmark[i][v] - to_landmark[i][t]
+    # Unreachable distances are inf; an inf bound proves v cannot reach t, and inf - inf
+    # gives nan, which never wins a comparison and so is ignored.
+    def __init__(self, graph: CompiledGraph, count: int = 8, accessibility_required: bool = False):
+        self.graph = graph
+        self.accessibility_required = accessibility_required
+        self.nodes: List[int] = []
+        self.from_landmark: List[array] = []
+        self.to_landmark: List[array] = []
+        self._select(count)
+
+    def _select(self, count: int):
+        # Farthest-point selection: each new landmark is the usable node farthest from the
+        # landmarks chosen so far, which spreads them over the edges of the mall
+        graph = self.graph
+        reverse = reverse_graph(graph)
+        usable = [
+            node for node in range(graph.node_count)
+            if not self.accessibility_required or graph.accessible[node]
+        ]
+        if not usable:
+            return
+        closest = [float('inf')] * graph.node_count
+        candidate = usable[0]
+        for _ in range(min(count, len(usable))):
+            forward, _ = shortest_path_tree(graph, [candidate], self.accessibility_required)
+            backward, _ = shortest_path_tree(reverse, [candidate], self.accessibility_required)
+            self.nodes.append(candidate)
+            self.from_landmark.append(array('d', forward))
+            self.to_landmark.append(array('d', backward))
+            for node in usable:
+                distance = min(forward[node], backward[node])
+                if distance < closest[node]:
+                    closest[node] = distance
+            # Prefer a reachable node; unreachable ones (closest == inf) come next
+            candidate = max(
+                (node for node in usable if node not in self.nodes),
+                key=lambda node: (closest[node] < float('inf'), closest[node]),
+                default=None
+            )
+            if candidate is None:
+                break
+
+    def heuristic(self, end_nodes, reverse: bool = False) -> Callable[[int], float]:
+        # reverse bounds d(t, v) instead, for searches running backwards from end_nodes;
+        # that is the forward bound on the reverse graph, where the two tables swap roles
+        if reverse:
+            rows = list(zip(self.to_landmark, self.from_landmark))
+        else:
+            rows = list(zip(self.from_landmark, self.to_landmark))
+        targets = [[(forward[end_node], backward[end_node]) for forward, backward in rows] for end_node in end_nodes]
+
+        def estimate(node: int) -> float:
+            best = float('inf')
+            for target_rows in targets:
+                bound = 0.0
+                for (forward, backward), (forward_target, backward_target) in zip(rows, target_rows):
+                    value = forward_target - forward[node]
+                    if value > bound:
+                        bound = value
+                    value = backward[node] - backward_target
+                    if value > bound:
+                        bound = value
+                if bound < best:
+                    best = bound
+            return best
+
+        return estimate
+
+    def __repr__(self):
+        return f"Landmarks {self.nodes} over {self.graph.node_count} nodes"
+
+def build_landmarks(mall: Mall, count: int = 8) -> Dict[bool, Landmarks]:
+    # One landmark set per accessibility mode; find_shortest_path uses them until the next build_graph
+    graph = get_compiled_graph(mall)
+    landmarks = {
+        accessibility_required: Landmarks(graph, count, accessibility_required)
+        for accessibility_required in (False, True)
+    }
+    mall.landmarks = landmarks
+    return landmarks
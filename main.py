@@ -1,37 +1,93 @@
 import argparse
-from data_loader import load_mall_from_json
+import json
+from mall_binary import load_mall
 from pathfinding import find_shortest_path, generate_instructions
-from visualization import visualize_mall
+
+# Plotting pulls in matplotlib and NumPy, which cost several times more than loading a mall and
+# routing; they are only imported for --plot and --render. Without them a route from
+# mall_data.json should take well under COLD_START_TARGET_MS from interpreter start
+# (see cli_cold_start in benchmark.py).
+COLD_START_TARGET_MS = 150
 
 def main():
     parser = argparse.ArgumentParser(description="Mall Navigation")
     parser.add_argument("start_shop", help="Name of the starting shop")
     parser.add_argument("end_shop", help="Name of the destination shop")
     parser.add_argument("--accessible", action="store_true", help="Require accessible routes")
+    parser.add_argument(
+        "--data",
+        default="mall_data.json",
+        help="Mall JSON file, or a compiled .mallbin file from mall_binary.py"
+    )
+    parser.add_argument("--bidirectional", action="store_true", help="Search from both shops at once")
+    parser.add_argument("--profile", action="store_true", help="Print search counters and phase timings")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="Output format")
+    parser.add_argument("--plot", action="store_true", help="Show the route in an interactive 3D window")
+    parser.add_argument("--render", metavar="FILE", help="Save the route map to an image file (e.g. route.png)")
     args = parser.parse_args()
 
-    mall = load_mall_from_json('mall_data.json')
+    mall = load_mall(args.data)
 
     # Find the shortest path
+    stats = {} if args.profile else None
     path = find_shortest_path(
         mall,
         args.start_shop,
         args.end_shop,
-        accessibility_required=args.accessible
+        accessibility_required=args.accessible,
+        stats=stats,
+        bidirectional=args.bidirectional
     )
+    found = isinstance(path, list)
+    instructions = generate_instructions(mall, path) if found else []
+    suggestions = {}
+    if not found:
+        for shop_name in (args.start_shop, args.end_shop):
+            if not mall.get_shop_node_ids(shop_name):
+                suggestions[shop_name] = mall.suggest_shop_names(shop_name)
 
     # Output the result
-    if isinstance(path, list):
-        print(f"Shortest path from {args.start_shop} to {args.end_shop}:")
-        for step in path:
-            print(" ->", step)
-        instructions = generate_instructions(mall, path)
-        print("\nTurn-by-turn Instructions:")
-        for instruction in instructions:
-            print(instruction)
-        visualize_mall(mall, path)
+    if args.format == "json":
+        result = {
+            'start': args.start_shop,
+            'end': args.end_shop,
+            'accessible': args.accessible,
+            'found': found,
+            'path': path if found else [],
+            'instructions': instructions,
+        }
+        if not found:
+            result['error'] = path
+            result['suggestions'] = suggestions
+        if stats is not None:
+            result['profile'] = stats
+        print(json.dumps(result))
     else:
-        print(path)
+        if stats is not None:
+            print("Search profile:")
+            for name, value in stats.items():
+                print(f"  {name}: {round(value, 4) if isinstance(value, float) else value}")
+        if found:
+            print(f"Shortest path from {args.start_shop} to {args.end_shop}:")
+            for step in path:
+                print(" ->", step)
+            print("\nTurn-by-turn Instructions:")
+            for instruction in instructions:
+                print(instruction)
+        else:
+            for shop_name, names in suggestions.items():
+                print(f"Shop '{shop_name}' not found. Did you mean:")
+                for suggestion in names:
+                    print(f" - {suggestion}")
+            print(path)
+
+    if found and (args.plot or args.render):
+        if not args.plot:
+            # Draw off-screen so that --render works without a display
+            import matplotlib
+            matplotlib.use("Agg")
+        from visualization import visualize_mall
+        visualize_mall(mall, path, output=args.render, show=args.plot)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import List, Tuple, Optional
+from models import Mall
+from compiled_graph import CompiledGraph, GraphView, compute_floor_weight, get_compiled_graph
+from data_loader import load_mall_from_json, load_mall_from_dict, mall_to_dict
+
+# File layout (native byte order, recorded in the header):
+#   header   magic, format version, byte order, node count, edge count, metadata offset/length
+#   sections offset/length pairs for each array in ARRAY_SECTIONS, then the array bytes,
+#            each 8-byte aligned so they can be cast straight out of the memory map
+#   metadata UTF-8 JSON with the node IDs, entity tables (mall_data.json schema) and name index
+MAGIC = b'MALLBIN\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQ')
+SECTION = struct.Struct('<QQ')
+ARRAY_SECTIONS: List[Tuple[str, str]] = [
+    ('offsets', 'q'),
+    ('targets', 'q'),
+    ('weights', 'd'),
+    ('xs', 'd'),
+    ('ys', 'd'),
+    ('levels', 'q'),
+    ('kinds', 'b'),
+    ('accessible', 'b')
+]
+BYTE_ORDERS = {'little': 1, 'big': 2}
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+def save_compiled_mall(mall: Mall, file_path: str):
+    with open(file_path, 'wb') as f:
+        f.write(compiled_mall_bytes(mall))
+
+def compiled_mall_bytes(mall: Mall) -> bytes:
+    # The compiled mall file contents, for writing to a file or a shared memory block
+    graph = get_compiled_graph(mall)
+    metadata = json.dumps({
+        'node_ids': graph.node_ids,
+        'mall': mall_to_dict(mall),
+        'shop_index': graph.shop_index,
+        'shop_attachments': mall.shop_attachments,
+        'attachment_slack': mall.attachment_slack,
+        'disabled_edges': sorted(mall.disabled_edges),
+        'weight_layer': _weight_layer_to_dict(mall.weight_layer)
+    }).encode('utf-8')
+
+    payloads = []
+    for name, typecode in ARRAY_SECTIONS:
+        # Weights are stored as built; disabled edges and the weight layer are re-applied on load
+        values = graph.base_weights if name == 'weights' else getattr(graph, name)
+        if not isinstance(values, array) or values.typecode != typecode:
+            values = array(typecode, values)
+        payloads.append(values.tobytes())
+
+    position = _align(HEADER.size + SECTION.size * len(ARRAY_SECTIONS))
+    sections = []
+    for payload in payloads:
+        sections.append((position, len(payload)))
+        position = _align(position + len(payload))
+    metadata_offset = position
+
+    data = bytearray(metadata_offset + len(metadata))
+    HEADER.pack_into(
+        data, 0, MAGIC, FORMAT_VERSION, BYTE_ORDERS[sys.byteorder],
+        graph.node_count, graph.edge_count, metadata_offset, len(metadata)
+    )
+    for index, (offset, length) in enumerate(sections):
+        SECTION.pack_into(data, HEADER.size + SECTION.size * index, offset, length)
+    for (offset, length), payload in zip(sections, payloads):
+        data[offset:offset + length] = payload
+    data[metadata_offset:] = metadata
+    return bytes(data)
+
+def load_compiled_mall(file_path: str) -> Mall:
+    # The graph arrays are read-only views into a shared memory map of the file, so processes
+    # that load the same file share those pages instead of holding private copies
+    with open(file_path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return compiled_mall_from_buffer(buffer, file_path)
+
+def compiled_mall_from_buffer(buffer, source: str) -> Mall:
+    # Mall whose graph arrays are views into buffer (compiled mall file contents); source names
+    # the buffer in errors. A read-only buffer gives read-only arrays.
+    magic, version, byte_order, node_count, edge_count, metadata_offset, metadata_length = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{source} is not a compiled mall file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{source} has format version {version}, expected {FORMAT_VERSION}")
+    if byte_order != BYTE_ORDERS[sys.byteorder]:
+        raise ValueError(f"{source} was compiled on a machine with a different byte order")
+
+    metadata = json.loads(bytes(buffer[metadata_offset:metadata_offset + metadata_length]).decode('utf-8'))
+    mall = load_mall_from_dict(metadata['mall'], build=False)
+    mall.shop_attachments = metadata['shop_attachments']
+    mall.attachment_slack = metadata['attachment_slack']
+
+    graph = CompiledGraph()
+    view = memoryview(buffer)
+    for index, (name, typecode) in enumerate(ARRAY_SECTIONS):
+        offset, length = SECTION.unpack_from(buffer, HEADER.size + SECTION.size * index)
+        setattr(graph, name, view[offset:offset + length].cast(typecode))
+    graph.base_weights = graph.adjusted_weights = graph.weights
+    graph.buffer = buffer  # Keep the buffer open for as long as the graph is alive
+    graph.node_ids = metadata['node_ids']
+    graph.index = {node_id: node for node, node_id in enumerate(graph.node_ids)}
+    graph.entities = [mall.get_entity_by_node_id(node_id) for node_id in graph.node_ids]
+    # Files written before shop names were case-folded hold lower-cased keys
+    graph.shop_index = {}
+    for name, nodes in metadata['shop_index'].items():
+        graph.shop_index.setdefault(name.casefold(), []).extend(nodes)
+    graph.floor_weight = compute_floor_weight(graph)
+    if graph.node_count != node_count or graph.edge_count != edge_count:
+        raise ValueError(f"{source} is truncated or corrupt")
+
+    # Disabled edges get a private copy of the weights; the other arrays stay shared
+    mall.disabled_edges = {tuple(edge) for edge in metadata.get('disabled_edges', [])}
+    if mall.disabled_edges:
+        graph.set_edges_enabled(list(mall.disabled_edges), False)
+    if metadata.get('weight_layer'):
+        # Imported here: the layer needs NumPy, which most loads can do without
+        from weight_layer import WeightLayer
+        layer = mall.weight_layer = WeightLayer(mall)
+        values = metadata['weight_layer']
+        layer.edge_multipliers = {(from_id, to_id): multiplier for from_id, to_id, multiplier in values['edge_multipliers']}
+        layer.connector_multipliers = values['connector_multipliers']
+        layer.connector_waits = values['connector_waits']
+        layer.apply_to(graph)
+
+    # Mall.graph is served from the mapped arrays; build_graph rebuilds a dict graph when needed
+    mall.compiled_graph = graph
+    mall.graph = GraphView(graph)
+    return mall
+
+def _weight_layer_to_dict(layer) -> Optional[dict]:
+    if layer is None:
+        return None
+    return {
+        'edge_multipliers': [[from_id, to_id, multiplier] for (from_id, to_id), multiplier in layer.edge_multipliers.items()],
+        'connector_multipliers': layer.connector_multipliers,
+        'connector_waits': layer.connector_waits
+    }
+
+def load_mall(file_path: str) -> Mall:
+    # Compiled .mallbin files are memory-mapped, anything else is read as mall JSON
+    if file_path.endswith('.mallbin'):
+        return load_compiled_mall(file_path)
+    return load_mall_from_json(file_path)
+
+if __name__ == "__main__":
+    # python mall_binary.py mall_data.json mall_data.mallbin
+    save_compiled_mall(load_mall_from_json(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+from models import Mall
+from mall_binary import compiled_mall_bytes, compiled_mall_from_buffer
+
+# Process pools whose workers each hold a copy of one mall. The mall is shipped to the workers
+# as compiled mall file contents (mall_binary.py), so the copies keep the closed edges and the
+# weight layer of the original along with its layout and shop attachment settings.
+
+def mall_process_pool(mall: Mall, processes: int, setup: Optional[Callable[[Mall], object]] = None) -> ProcessPoolExecutor:
+    # Tasks submitted to the pool read their mall, or what setup(mall) made of it once per
+    # worker (e.g. a renderer), with worker_state()
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(compiled_mall_bytes(mall), setup)
+    )
+
+def worker_state():
+    return _worker_state
+
+# Mall, or setup's result, built once in each pool worker
+_worker_state = None
+
+def _init_worker(data: bytes, setup: Optional[Callable[[Mall], object]]):
+    global _worker_state
+    mall = compiled_mall_from_buffer(data, "worker copy of the mall")
+    _worker_state = setup(mall) if setup is not None else mall
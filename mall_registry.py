@@ -0,0 +1,180 @@
+import json
+import struct
+import time
+import uuid
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Tuple
+from models import Mall
+from mall_binary import compiled_mall_bytes, compiled_mall_from_buffer, load_mall
+
+# Manifest block layout: generation and payload length, then UTF-8 JSON
+#   {mall_id: [version, block name]}
+# The generation is odd while the publisher is rewriting the manifest and even otherwise, so
+# readers can detect a torn read and retry (a sequence lock).
+MANIFEST_HEADER = struct.Struct('<QQ')
+MANIFEST_CAPACITY = 1 << 20
+READ_RETRIES = 1000
+
+class MallRegistry:
+    # Publisher side, owned by one process. Each published mall version is written once, in the
+    # compiled mall file format (mall_binary.py), to its own shared memory block; worker processes
+    # open the registry by name with MallRegistryReader and map those blocks read-only.
+    # Publishing a new version of a mall swaps the manifest entry and unlinks the old block:
+    # workers still using the old version keep their mapping until they drop it.
+    def __init__(self, capacity: int = MANIFEST_CAPACITY):
+        self.prefix = f"mall_{uuid.uuid4().hex[:12]}"
+        self.manifest = shared_memory.SharedMemory(name=f"{self.prefix}_manifest", create=True, size=capacity)
+        self.generation = 0
+        self.entries: Dict[str, Tuple[int, str]] = {}  # mall_id: (version, block name)
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}  # mall_id: current block
+        self._write_manifest()
+
+    @property
+    def name(self) -> str:
+        # Pass this to MallRegistryReader in the workers
+        return self.manifest.name
+
+    def publish(self, mall_id: str, mall: Mall) -> int:
+        # Make mall the current version of mall_id; returns the new version number
+        data = compiled_mall_bytes(mall)
+        version = self.entries.get(mall_id, (0, ''))[0] + 1
+        block = shared_memory.SharedMemory(name=f"{self.prefix}_{uuid.uuid4().hex[:12]}", create=True, size=len(data))
+        block.buf[:len(data)] = data
+        self.entries[mall_id] = (version, block.name)
+        try:
+            self._write_manifest()
+        except ValueError:
+            del self.entries[mall_id]
+            self._release(block)
+            raise
+        previous = self.blocks.get(mall_id)
+        self.blocks[mall_id] = block
+        if previous is not None:
+            self._release(previous)
+        return version
+
+    def publish_file(self, mall_id: str, file_path: str) -> int:
+        # Mall JSON or a compiled .mallbin file
+        return self.publish(mall_id, load_mall(file_path))
+
+    def retire(self, mall_id: str):
+        if mall_id not in self.entries:
+            raise ValueError(f"Unknown mall {mall_id!r}")
+        del self.entries[mall_id]
+        self._write_manifest()
+        self._release(self.blocks.pop(mall_id))
+
+    def versions(self) -> Dict[str, int]:
+        return {mall_id: version for mall_id, (version, _) in self.entries.items()}
+
+    def close(self):
+        # Unlink every block; attached workers keep their mappings until they exit
+        for block in self.blocks.values():
+            self._release(block)
+        self.blocks.clear()
+        self.entries.clear()
+        self._release(self.manifest)
+
+    def _write_manifest(self):
+        payload = json.dumps(self.entries).encode('utf-8')
+        if MANIFEST_HEADER.size + len(payload) > self.manifest.size:
+            raise ValueError(f"Registry manifest is full ({self.manifest.size} bytes)")
+        buffer = self.manifest.buf
+        self.generation += 1
+        MANIFEST_HEADER.pack_into(buffer, 0, self.generation, 0)
+        buffer[MANIFEST_HEADER.size:MANIFEST_HEADER.size + len(payload)] = payload
+        self.generation += 1
+        MANIFEST_HEADER.pack_into(buffer, 0, self.generation, len(payload))
+
+    @staticmethod
+    def _release(block: shared_memory.SharedMemory):
+        block.close()
+        block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"MallRegistry {self.name} with {len(self.entries)} malls"
+
+class MallRegistryReader:
+    # Worker side. get() returns the current version of a mall, attaching to its block on first
+    # use and again whenever a new version has been published; the graph arrays are read-only
+    # views of the shared block, while entities and node IDs are rebuilt in each worker.
+    def __init__(self, name: str):
+        self.manifest = _attach(name)
+        self.generation = -1
+        self.entries: Dict[str, Tuple[int, str]] = {}
+        self.malls: Dict[str, Tuple[int, Mall]] = {}  # mall_id: (version, mall)
+
+    def get(self, mall_id: str) -> Mall:
+        for _ in range(READ_RETRIES):
+            self._refresh()
+            entry = self.entries.get(mall_id)
+            if entry is None:
+                self.malls.pop(mall_id, None)
+                raise ValueError(f"Unknown mall {mall_id!r}")
+            version, block_name = entry
+            cached = self.malls.get(mall_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            try:
+                block = _attach(block_name)
+            except FileNotFoundError:
+                # Replaced again between reading the manifest and attaching
+                continue
+            mall = compiled_mall_from_buffer(block.buf.toreadonly(), f"{mall_id} version {version}")
+            mall.compiled_graph.block = block  # Keep the block mapped for as long as the graph is alive
+            self.malls[mall_id] = (version, mall)
+            return mall
+        raise ValueError(f"Could not attach to {mall_id!r}: it keeps being replaced")
+
+    def versions(self) -> Dict[str, int]:
+        self._refresh()
+        return {mall_id: version for mall_id, (version, _) in self.entries.items()}
+
+    def _refresh(self):
+        # Re-read the manifest if the publisher has changed it since the last read
+        buffer = self.manifest.buf
+        for _ in range(READ_RETRIES):
+            generation, length = MANIFEST_HEADER.unpack_from(buffer, 0)
+            if generation == self.generation:
+                return
+            if generation % 2 == 0:
+                payload = bytes(buffer[MANIFEST_HEADER.size:MANIFEST_HEADER.size + length])
+                if MANIFEST_HEADER.unpack_from(buffer, 0)[0] == generation:
+                    self.entries = {mall_id: tuple(entry) for mall_id, entry in json.loads(payload).items()}
+                    self.generation = generation
+                    return
+            time.sleep(0)
+        raise ValueError("Registry manifest is being rewritten too often to read")
+
+    def __repr__(self):
+        return f"MallRegistryReader of {self.manifest.name} with {len(self.malls)} malls attached"
+
+class _AttachedBlock(shared_memory.SharedMemory):
+    # The graph arrays are views of buf, so the block can only be closed after they are gone;
+    # if it is collected first (at interpreter exit), the mapping goes away with them instead
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Attach without registering the block with the resource tracker, which would unlink it when
+    # this worker exits (or, when the tracker is shared with the publisher, drop the publisher's
+    # registration). Python 3.13 has track=False for this; earlier versions always register.
+    try:
+        return _AttachedBlock(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return _AttachedBlock(name=name)
+    finally:
+        resource_tracker.register = register
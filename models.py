@@ -1,20 +1,45 @@
 import math
 from collections import defaultdict
 from typing import List, Dict, Optional, Tuple, Union
-import difflib
+from spatial_index import SpatialIndex
+from name_index import ShopNameIndex
 
 class Shop:
-    def __init__(self, name: str, floor: 'Floor', x: float = 0, y: float = 0):
+    __slots__ = ('name', 'floor', 'x', 'y', 'width', 'depth', 'height', '_connections')
+
+    def __init__(
+        self,
+        name: str,
+        floor: 'Floor',
+        x: float = 0,
+        y: float = 0,
+        width: Optional[float] = None,
+        depth: Optional[float] = None,
+        height: Optional[float] = None
+    ):
         self.name = name
         self.floor = floor  # Reference to the Floor object
         self.x = x  # X-coordinate
         self.y = y  # Y-coordinate
-        self.connections: List[Union['Shop', 'Connector']] = []  # Adjacent shops or connectors
+        # Size of the shop's box in the 3D views; None draws the default size
+        self.width = width
+        self.depth = depth
+        self.height = height
+        self._connections: Optional[List[Union['Shop', 'Connector']]] = None
+
+    @property
+    def connections(self) -> List[Union['Shop', 'Connector']]:
+        # Adjacent shops or connectors; the list is only allocated when first used
+        if self._connections is None:
+            self._connections = []
+        return self._connections
 
     def __repr__(self):
         return f"{self.name} @ Level {self.floor.level}"
 
 class Connector:
+    __slots__ = ('name', 'connector_type', 'accessible', 'direction', 'x', 'y', 'floors', '_connections')
+
     def __init__(
         self,
         name: str,
@@ -31,7 +56,14 @@ class Connector:
         self.x = x  # X-coordinate
         self.y = y  # Y-coordinate
         self.floors: List['Floor'] = []  # List of Floor objects it connects
-        self.connections: Dict[int, List[Union['Shop', 'Connector']]] = defaultdict(list)  # floor_level: [connected shops]
+        self._connections: Optional[Dict[int, List[Union['Shop', 'Connector']]]] = None
+
+    @property
+    def connections(self) -> Dict[int, List[Union['Shop', 'Connector']]]:
+        # floor_level: [connected shops]; the dict is only allocated when first used
+        if self._connections is None:
+            self._connections = defaultdict(list)
+        return self._connections
 
     def __repr__(self):
         floor_levels = [floor.level for floor in self.floors]
@@ -57,6 +89,8 @@ class Connector:
             return True
 
 class CorridorNode:
+    __slots__ = ('id', 'x', 'y', 'floor', 'connections')
+
     def __init__(self, id: str, x: float, y: float, floor: 'Floor'):
         self.id = id  # Unique identifier
         self.x = x
@@ -68,6 +102,8 @@ class CorridorNode:
         return f"CorridorNode {self.id} @ Level {self.floor.level}"
 
 class Corridor:
+    __slots__ = ('id', 'floor', 'nodes')
+
     def __init__(self, id: str, floor: 'Floor', nodes: List[CorridorNode]):
         self.id = id
         self.floor = floor
@@ -77,12 +113,15 @@ class Corridor:
         return f"Corridor {self.id} @ Level {self.floor.level}"
 
 class Floor:
+    __slots__ = ('level', 'shops', 'connectors', 'corridors', 'corridor_nodes', 'corridor_index')
+
     def __init__(self, level: int):
         self.level = level
         self.shops: Dict[str, Shop] = {}  # name: Shop object
         self.connectors: Dict[str, Connector] = {}  # name: Connector object
         self.corridors: Dict[str, Corridor] = {}  # id: Corridor object
         self.corridor_nodes: Dict[str, CorridorNode] = {}  # id: CorridorNode object
+        self.corridor_index: Optional[SpatialIndex] = None  # Grid over corridor_nodes, built by Mall.build_graph
 
     def __repr__(self):
         return f"Floor {self.level}"
@@ -91,6 +130,17 @@ class Mall:
     def __init__(self):
         self.floors: Dict[int, Floor] = {}  # level: Floor object
         self.graph: Dict[str, List[Tuple[str, float]]] = {}  # node_id: [(connected_node_id, weight)]
+        self.shop_attachments = 1  # Max corridor nodes each shop is attached to
+        self.attachment_slack = 0.25  # Extra attachments must be within (1 + slack) x the nearest distance
+        self.name_index: Optional[ShopNameIndex] = None  # Built on first shop lookup
+        self.graph_version = 0  # Bumped by build_graph and every closure change; cached routes key on it
+        self.disabled_edges: set = set()  # (node_id, connected_node_id) edges closed by the set_*_enabled methods
+        self.compiled_graph = None  # CompiledGraph, compiled from graph on first query (see compiled_graph.py)
+        self.route_table = None  # Optional RouteTable of precomputed shop-to-shop routes (see route_table.py)
+        self.contraction_hierarchies = None  # Optional {accessibility_required: ContractionHierarchy} (see contraction_hierarchy.py)
+        self.hierarchy_rebuilder = None  # Optional HierarchyRebuilder that restores dropped hierarchies in the background
+        self.landmarks = None  # Optional {accessibility_required: Landmarks} for the A* heuristic (see landmarks.py)
+        self.weight_layer = None  # Optional WeightLayer of congestion multipliers and waits (see weight_layer.py)
 
     def add_floor(self, floor: Floor):
         self.floors[floor.level] = floor
@@ -107,21 +157,20 @@ class Mall:
         else:
             raise ValueError("Unknown entity type")
 
+    def get_name_index(self) -> ShopNameIndex:
+        if self.name_index is None:
+            shops = [shop for floor in self.floors.values() for shop in floor.shops.values()]
+            self.name_index = ShopNameIndex(shops)
+        return self.name_index
+
     def get_shop_node_ids(self, shop_name: str) -> List[str]:
-        node_ids = []
-        possible_names = set()
-        for floor in self.floors.values():
-            for shop in floor.shops.values():
-                possible_names.add(shop.name)
-                if shop.name.lower() == shop_name.lower():
-                    node_id = self.get_node_id(shop)
-                    node_ids.append(node_id)
-        if not node_ids:
-            print(f"Shop '{shop_name}' not found. Did you mean:")
-            suggestions = difflib.get_close_matches(shop_name, possible_names)
-            for suggestion in suggestions:
-                print(f" - {suggestion}")
-        return node_ids
+        return [self.get_node_id(shop) for shop in self.get_name_index().lookup(shop_name)]
+
+    def suggest_shop_names(self, shop_name: str, limit: int = 3) -> List[str]:
+        return [name for name, _ in self.get_name_index().suggest(shop_name, limit)]
+
+    def search_shops(self, query: str, limit: int = 10) -> Dict[str, object]:
+        return self.get_name_index().search(query, limit)
 
     def get_entity_by_node_id(self, node_id: str) -> Optional[Union[Shop, Connector, CorridorNode]]:
         if "Connector:" in node_id:
@@ -155,37 +204,54 @@ class Mall:
 
     def build_graph(self):
         self.graph = {}
+        self.graph_version += 1
+        self.name_index = None
+        self.compiled_graph = None
+        self.route_table = None
+        self.contraction_hierarchies = None
+        self.hierarchy_rebuilder = None
+        self.landmarks = None
+        # One string per node, shared by its key and every edge that leads to it
+        node_ids: Dict[Tuple[int, Optional[int]], str] = {}
+
+        def get_node_id(entity: Union[Shop, Connector, CorridorNode], floor_level: Optional[int] = None) -> str:
+            key = (id(entity), floor_level)
+            node_id = node_ids.get(key)
+            if node_id is None:
+                node_id = node_ids[key] = self.get_node_id(entity, floor_level)
+            return node_id
+
         # Add corridor nodes and their connections
         for floor in self.floors.values():
             floor_level = floor.level
+            floor.corridor_index = SpatialIndex(list(floor.corridor_nodes.values()))
             # Add corridor nodes to graph
             for node in floor.corridor_nodes.values():
-                node_id = self.get_node_id(node)
+                node_id = get_node_id(node)
                 self.graph.setdefault(node_id, [])
                 # Connect to other corridor nodes
                 for connected_node in node.connections:
-                    connected_node_id = self.get_node_id(connected_node)
+                    connected_node_id = get_node_id(connected_node)
                     weight = calculate_weight(node, connected_node)
                     self.graph[node_id].append((connected_node_id, weight))
             # Add shops and connect them to corridor nodes
             for shop in floor.shops.values():
-                shop_node_id = self.get_node_id(shop)
+                shop_node_id = get_node_id(shop)
                 self.graph.setdefault(shop_node_id, [])
-                # Connect to nearest corridor node
-                nearest_node = self.find_nearest_corridor_node(shop, floor)
-                if nearest_node:
-                    corridor_node_id = self.get_node_id(nearest_node)
-                    weight = calculate_weight(shop, nearest_node)
+                # Connect to the nearest corridor node(s)
+                for corridor_node in self.find_attachment_corridor_nodes(shop, floor):
+                    corridor_node_id = get_node_id(corridor_node)
+                    weight = calculate_weight(shop, corridor_node)
                     self.graph[shop_node_id].append((corridor_node_id, weight))
                     self.graph.setdefault(corridor_node_id, []).append((shop_node_id, weight))
             # Add connectors and connect them to corridor nodes
             for connector in floor.connectors.values():
-                connector_node_id = self.get_node_id(connector, floor_level)
+                connector_node_id = get_node_id(connector, floor_level)
                 self.graph.setdefault(connector_node_id, [])
                 # Connect to nearest corridor node
                 nearest_node = self.find_nearest_corridor_node(connector, floor)
                 if nearest_node:
-                    corridor_node_id = self.get_node_id(nearest_node)
+                    corridor_node_id = get_node_id(nearest_node)
                     weight = calculate_weight(connector, nearest_node)
                     self.graph[connector_node_id].append((corridor_node_id, weight))
                     self.graph.setdefault(corridor_node_id, []).append((connector_node_id, weight))
@@ -193,13 +259,115 @@ class Mall:
                 for other_floor in connector.floors:
                     other_level = other_floor.level
                     if other_level != floor_level:
-                        other_node_id = self.get_node_id(connector, other_level)
+                        other_node_id = get_node_id(connector, other_level)
                         weight = connector.get_vertical_weight(floor_level, other_level)
                         if connector.is_accessible_between_floors(floor_level, other_level):
                             self.graph[connector_node_id].append((other_node_id, weight))
         # No need to add reverse edges since they are added in both directions
 
+    def set_connector_enabled(self, connector_name: str, enabled: bool):
+        # Close or reopen a connector on every floor it serves
+        connector = self._get_connector(connector_name)
+        edges = []
+        for floor in connector.floors:
+            edges.extend(self._node_edges(self.get_node_id(connector, floor.level)))
+        self._set_edges_enabled(edges, enabled)
+
+    def set_connector_direction_enabled(self, connector_name: str, direction: str, enabled: bool):
+        # Close or reopen the 'up' or 'down' vertical edges of a connector, e.g. a stopped escalator
+        if direction not in ('up', 'down'):
+            raise ValueError("direction must be 'up' or 'down'")
+        connector = self._get_connector(connector_name)
+        edges = []
+        for floor in connector.floors:
+            node_id = self.get_node_id(connector, floor.level)
+            for other_floor in connector.floors:
+                going_up = other_floor.level > floor.level
+                if other_floor.level != floor.level and going_up == (direction == 'up'):
+                    edges.append((node_id, self.get_node_id(connector, other_floor.level)))
+        self._set_edges_enabled(edges, enabled)
+
+    def set_corridor_edge_enabled(self, floor_level: int, from_node_id: str, to_node_id: str, enabled: bool):
+        # Close or reopen the corridor segment between two corridor nodes, in both directions
+        floor = self.floors.get(floor_level)
+        if floor is None or from_node_id not in floor.corridor_nodes or to_node_id not in floor.corridor_nodes:
+            raise ValueError(f"Unknown corridor nodes {from_node_id} / {to_node_id} on floor {floor_level}")
+        from_id = self.get_node_id(floor.corridor_nodes[from_node_id])
+        to_id = self.get_node_id(floor.corridor_nodes[to_node_id])
+        self._set_edges_enabled([(from_id, to_id), (to_id, from_id)], enabled)
+
+    def set_shop_entrance_enabled(self, shop_name: str, floor_level: int, enabled: bool, corridor_node_id: Optional[str] = None):
+        # Close or reopen a shop's links to the corridor, or only the one to corridor_node_id
+        floor = self.floors.get(floor_level)
+        if floor is None or shop_name not in floor.shops:
+            raise ValueError(f"Unknown shop {shop_name} on floor {floor_level}")
+        edges = self._node_edges(self.get_node_id(floor.shops[shop_name]))
+        if corridor_node_id is not None:
+            corridor_id = f"CorridorNode:{corridor_node_id} @ Level {floor_level}"
+            edges = [edge for edge in edges if corridor_id in edge]
+        self._set_edges_enabled(edges, enabled)
+
+    def _get_connector(self, connector_name: str) -> Connector:
+        for floor in self.floors.values():
+            connector = floor.connectors.get(connector_name)
+            if connector:
+                return connector
+        raise ValueError(f"Unknown connector {connector_name}")
+
+    def _connected_node_ids(self, node_id: str) -> List[str]:
+        # Read from the compiled graph when there is one, since malls loaded from a compiled
+        # file have no Mall.graph
+        compiled = self.compiled_graph
+        if compiled is not None and node_id in compiled.index:
+            node = compiled.index[node_id]
+            return [compiled.node_ids[neighbor] for neighbor, _ in compiled.neighbors(node)]
+        return [connected_node_id for connected_node_id, _ in self.graph.get(node_id, [])]
+
+    def _node_edges(self, node_id: str) -> List[Tuple[str, str]]:
+        # Every edge leaving node_id, plus the reverse edges that lead back to it
+        edges = []
+        for connected_node_id in self._connected_node_ids(node_id):
+            edges.append((node_id, connected_node_id))
+            if node_id in self._connected_node_ids(connected_node_id):
+                edges.append((connected_node_id, node_id))
+        return edges
+
+    def _set_edges_enabled(self, edges: List[Tuple[str, str]], enabled: bool):
+        # Record the change, patch the compiled graph in place and drop only the cached
+        # results that depend on the changed edges
+        edges = [edge for edge in edges if (edge in self.disabled_edges) == enabled]
+        if not edges:
+            return
+        if enabled:
+            self.disabled_edges.difference_update(edges)
+        else:
+            self.disabled_edges.update(edges)
+        self.graph_version += 1
+
+        compiled = self.compiled_graph
+        if compiled is None:
+            return
+        self._edges_reweighted(compiled.set_edges_enabled(edges, enabled), enabled)
+
+    def _edges_reweighted(self, changed: List[Tuple[int, int]], shortened: bool):
+        # Update the precomputed engines after the compiled weights of changed edges moved;
+        # shortened is True if any of them got cheaper
+        modes = self.compiled_graph.affected_modes(changed)
+        if self.route_table is not None:
+            self.route_table.edges_changed(changed, shortened, modes)
+        for mode in modes:
+            if self.contraction_hierarchies is not None:
+                self.contraction_hierarchies.pop(mode, None)
+            # Landmark bounds stay admissible when edges only get longer
+            if shortened and self.landmarks is not None:
+                self.landmarks.pop(mode, None)
+        # Also when no mode was affected: a build that overlapped this change was discarded
+        if self.hierarchy_rebuilder is not None:
+            self.hierarchy_rebuilder.schedule()
+
     def find_nearest_corridor_node(self, entity: Union[Shop, Connector], floor: Floor) -> Optional[CorridorNode]:
+        if floor.corridor_index is not None:
+            return floor.corridor_index.nearest(entity.x, entity.y)
         min_distance = float('inf')
         nearest_node = None
         for node in floor.corridor_nodes.values():
@@ -209,6 +377,15 @@ class Mall:
                 nearest_node = node
         return nearest_node
 
+    def find_attachment_corridor_nodes(self, shop: Shop, floor: Floor) -> List[CorridorNode]:
+        # The nearest corridor node, plus up to shop_attachments - 1 others that are almost as close
+        nearest_node = self.find_nearest_corridor_node(shop, floor)
+        if nearest_node is None or self.shop_attachments <= 1 or floor.corridor_index is None:
+            return [nearest_node] if nearest_node else []
+        radius = calculate_weight(shop, nearest_node) * (1 + self.attachment_slack)
+        nodes = floor.corridor_index.within_radius(shop.x, shop.y, radius)
+        return nodes[:self.shop_attachments]
+
     def __repr__(self):
         return f"Mall with Floors: {list(self.floors.keys())}"
 
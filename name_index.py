@@ -0,0 +1,104 @@
+import bisect
+import difflib
+from collections import OrderedDict, defaultdict
+from typing import List, Dict, Tuple, Any
+
+class ShopNameIndex:
+    # Search structures over shop names, keyed on case-folded names:
+    #   exact lookups through a dict,
+    #   autocomplete through sorted name and word lists (prefix ranges found by bisection),
+    #   typo-tolerant suggestions by trigram overlap, re-ranked with difflib on a short candidate list.
+    def __init__(self, shops: List[Any], suggestion_cache_size: int = 1024):
+        self.shops_by_key: Dict[str, List[Any]] = {}  # case-folded name: shops with that name
+        self.display_names: Dict[str, str] = {}  # case-folded name: name as written
+        for shop in shops:
+            key = shop.name.casefold()
+            self.shops_by_key.setdefault(key, []).append(shop)
+            self.display_names.setdefault(key, shop.name)
+
+        self.sorted_keys = sorted(self.shops_by_key)
+        self.sorted_words: List[Tuple[str, str]] = sorted(
+            (word, key) for key in self.shops_by_key for word in key.split()
+        )
+        self.trigrams: Dict[str, List[str]] = defaultdict(list)  # trigram: keys containing it
+        for key in self.shops_by_key:
+            for trigram in _trigrams(key):
+                self.trigrams[trigram].append(key)
+
+        self.suggestion_cache_size = suggestion_cache_size
+        self._suggestions: OrderedDict = OrderedDict()  # (query, limit, cutoff): suggestions
+
+    def lookup(self, name: str) -> List[Any]:
+        return self.shops_by_key.get(name.casefold(), [])
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[str]:
+        # Names starting with prefix first, then names with a later word starting with it
+        prefix = prefix.casefold().strip()
+        if not prefix:
+            return []
+        matches = []
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        for key in self.sorted_keys[start:]:
+            if not key.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(key)
+        if len(matches) < limit:
+            seen = set(matches)
+            start = bisect.bisect_left(self.sorted_words, (prefix, ''))
+            for word, key in self.sorted_words[start:]:
+                if not word.startswith(prefix) or len(matches) >= limit:
+                    break
+                if key not in seen:
+                    seen.add(key)
+                    matches.append(key)
+        return [self.display_names[key] for key in matches]
+
+    def suggest(self, query: str, limit: int = 3, cutoff: float = 0.6) -> List[Tuple[str, float]]:
+        # (name, similarity) pairs, best first, with the same similarity measure and default
+        # cutoff as difflib.get_close_matches
+        cache_key = (query.casefold(), limit, cutoff)
+        cached = self._suggestions.get(cache_key)
+        if cached is not None:
+            self._suggestions.move_to_end(cache_key)
+            return cached
+
+        query_key = cache_key[0]
+        shared: Dict[str, int] = defaultdict(int)
+        for trigram in _trigrams(query_key):
+            for key in self.trigrams.get(trigram, ()):
+                shared[key] += 1
+        candidates = sorted(shared, key=lambda key: -shared[key])[:max(limit * 10, 30)]
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query_key)
+        scored = []
+        for key in candidates:
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                score = matcher.ratio()
+                if score >= cutoff:
+                    scored.append((score, key))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        suggestions = [(self.display_names[key], score) for score, key in scored[:limit]]
+
+        self._suggestions[cache_key] = suggestions
+        if len(self._suggestions) > self.suggestion_cache_size:
+            self._suggestions.popitem(last=False)
+        return suggestions
+
+    def search(self, query: str, limit: int = 10) -> Dict[str, Any]:
+        # Structured result for search-as-you-type boxes
+        exact = self.lookup(query)
+        return {
+            'query': query,
+            'exact': exact[0].name if exact else None,
+            'completions': self.autocomplete(query, limit),
+            'suggestions': [{'name': name, 'score': round(score, 3)} for name, score in self.suggest(query, limit)]
+        }
+
+    def __repr__(self):
+        return f"ShopNameIndex with {len(self.shops_by_key)} names"
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
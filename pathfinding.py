@@ -1,169 +1,471 @@
 import heapq
 import math
-from typing import List, Dict, Tuple, Optional, Union
+import time
+from typing import List, Dict, Tuple, Optional, Union, Callable
 from models import Mall, Shop, Connector, CorridorNode
+from compiled_graph import CompiledGraph, KIND_CORRIDOR, get_compiled_graph, get_reverse_graph
 
 def find_shortest_path(
     mall: Mall,
     start_shop_name: str,
     end_shop_name: str,
-    accessibility_required: bool = False
+    accessibility_required: bool = False,
+    heuristic: str = 'auto',
+    stats: Optional[Dict[str, object]] = None,
+    bidirectional: bool = False
 ) -> Union[List[str], str]:
-    # Get all node IDs for the start and end shops
-    start_nodes = mall.get_shop_node_ids(start_shop_name)
-    end_nodes = set(mall.get_shop_node_ids(end_shop_name))
+    # heuristic: 'euclidean' for the straight-line estimate, 'auto' to also use the mall's
+    # landmarks when build_landmarks has been run, 'none' for plain Dijkstra.
+    # bidirectional searches from both ends at once when no route table or hierarchy answers.
+    # When a stats dict is given it is filled with the search counters and phase timings
+    # described in record_search.
+    started = time.perf_counter()
+    graph = get_compiled_graph(mall)
+
+    # Get all nodes for the start and end shops; the search itself runs on integer nodes
+    start_nodes = graph.shop_nodes(start_shop_name)
+    end_nodes = set(graph.shop_nodes(end_shop_name))
+    looked_up = time.perf_counter()
 
     if not start_nodes or not end_nodes:
+        if stats is not None:
+            record_search(stats, 'lookup', None, (started, looked_up, looked_up, looked_up, looked_up))
         return "One or both shops are not in the mall."
 
-    # Prepare positions for heuristic function
-    end_positions = {}
-    for end_node in end_nodes:
-        entity = mall.get_entity_by_node_id(end_node)
-        if entity:
-            if isinstance(entity, Shop):
-                end_level = entity.floor.level
-            elif isinstance(entity, Connector):
-                parts = end_node.split(' @ Level ')
-                end_level = int(parts[-1])
-            elif isinstance(entity, CorridorNode):
-                end_level = entity.floor.level
-            else:
-                continue  # Skip unknown entity types
-            end_positions[end_node] = (entity.x, entity.y, end_level)
-
-    def heuristic(node_id: str) -> float:
-        entity = mall.get_entity_by_node_id(node_id)
-        if not entity:
-            return float('inf')
-
-        # Extract the floor level
-        if isinstance(entity, Shop):
-            entity_level = entity.floor.level
-        elif isinstance(entity, Connector):
-            parts = node_id.split(' @ Level ')
-            entity_level = int(parts[-1])
-        elif isinstance(entity, CorridorNode):
-            entity_level = entity.floor.level
-        else:
-            return float('inf')  # Unknown entity type
+    # Answer from the precomputed shop-to-shop table when one has been built
+    route_table = mall.route_table
+    if route_table is not None and route_table.covers(start_nodes):
+        path = route_table.route(start_nodes, end_nodes, accessibility_required)
+        searched = time.perf_counter()
+        result = graph.to_node_ids(path) if path is not None else "No path found between the shops."
+        if stats is not None:
+            record_search(stats, 'route_table', path, (started, looked_up, looked_up, searched, time.perf_counter()))
+        return result
 
-        min_distance = float('inf')
-        for x, y, level in end_positions.values():
-            level_difference = abs(entity_level - level)
-            dx = entity.x - x
-            dy = entity.y - y
-            distance = math.hypot(dx, dy) + (level_difference * 10)
-            if distance < min_distance:
-                min_distance = distance
-        return min_distance
+    # Otherwise query the contraction hierarchy for this mode when one has been built
+    hierarchies = mall.contraction_hierarchies
+    if hierarchies is not None and accessibility_required in hierarchies:
+        query = hierarchies[accessibility_required].query(start_nodes, end_nodes)
+        searched = time.perf_counter()
+        path = query[1] if query is not None else None
+        result = graph.to_node_ids(path) if path is not None else "No path found between the shops."
+        if stats is not None:
+            record_search(stats, 'contraction_hierarchy', path, (started, looked_up, looked_up, searched, time.perf_counter()))
+        return result
+
+    if bidirectional:
+        return bidirectional_search(mall, graph, start_nodes, end_nodes, accessibility_required, heuristic, stats, (started, looked_up))
+
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    accessible = graph.accessible
+    estimate = make_heuristic(mall, graph, end_nodes, accessibility_required, heuristic)
+    estimates: Dict[int, float] = {}
+
+    def heuristic_value(node: int) -> float:
+        value = estimates.get(node)
+        if value is None:
+            value = estimates[node] = estimate(node)
+        return value
 
     # A* Algorithm Initialization
     heap = []
-    visited = {}
+    visited = {}  # node: best known cost
+    came_from = {}  # node: predecessor on the best known path
+    closed = set()  # settled nodes, never expanded twice
     for start_node in start_nodes:
-        heapq.heappush(heap, (heuristic(start_node), 0, start_node, [start_node]))
+        heapq.heappush(heap, (heuristic_value(start_node), 0, start_node))
         visited[start_node] = 0
+        came_from[start_node] = None
+    heuristic_ready = time.perf_counter()
+
+    # Only pushes and accessibility skips are counted in the loop; the other counters are
+    # derived from the heap, closed set and heuristic memo afterwards
+    pushes = len(heap)
+    filtered = 0
+    path = None
 
     while heap:
-        est_total_cost, cost_so_far, current_node, path = heapq.heappop(heap)
+        est_total_cost, cost_so_far, current_node = heapq.heappop(heap)
+
+        if current_node in closed or visited[current_node] < cost_so_far:
+            continue
 
         if current_node in end_nodes:
-            return path
+            path = current_node
+            break
 
-        if visited[current_node] < cost_so_far:
-            continue
+        closed.add(current_node)
 
-        for neighbor, weight in mall.graph.get(current_node, []):
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[edge]
+            if neighbor in closed:
+                continue
             # Check accessibility
-            if accessibility_required:
-                if "Connector:" in neighbor:
-                    connector = mall.get_connector_by_node_id(neighbor)
-                    if connector and not connector.accessible:
-                        continue
-            new_cost = cost_so_far + weight
-            if neighbor not in visited or new_cost < visited[neighbor]:
+            if accessibility_required and not accessible[neighbor]:
+                filtered += 1
+                continue
+            new_cost = cost_so_far + weights[edge]
+            # Disabled edges weigh inf and never pass this test
+            if new_cost < visited.get(neighbor, float('inf')):
                 visited[neighbor] = new_cost
-                total_estimated_cost = new_cost + heuristic(neighbor)
-                heapq.heappush(heap, (total_estimated_cost, new_cost, neighbor, path + [neighbor]))
+                came_from[neighbor] = current_node
+                total_estimated_cost = new_cost + heuristic_value(neighbor)
+                heapq.heappush(heap, (total_estimated_cost, new_cost, neighbor))
+                pushes += 1
 
-    return "No path found between the shops."
+    searched = time.perf_counter()
+    if path is not None:
+        path = reconstruct_path(came_from, path)
+        result = graph.to_node_ids(path)
+    else:
+        result = "No path found between the shops."
+    if stats is not None:
+        record_search(
+            stats, 'astar', path, (started, looked_up, heuristic_ready, searched, time.perf_counter()),
+            heap_pushes=pushes,
+            heap_pops=pushes - len(heap),
+            nodes_expanded=len(closed),
+            heuristic_calls=len(estimates),
+            accessibility_filtered=filtered
+        )
+    return result
 
-def generate_instructions(mall: Mall, path: List[str]) -> List[str]:
-    instructions = []
-    previous_entity = None
-    previous_direction = None
-    previous_floor = None
+def bidirectional_search(
+    mall: Mall,
+    graph: CompiledGraph,
+    start_nodes: List[int],
+    end_nodes,
+    accessibility_required: bool = False,
+    heuristic: str = 'auto',
+    stats: Optional[Dict[str, object]] = None,
+    timestamps: Optional[Tuple[float, float]] = None
+) -> Union[List[str], str]:
+    # Bidirectional A* with average potentials: the forward search orders nodes by
+    # g + p(v) and the backward search by g - p(v), where p(v) = (h_end(v) - h_start(v)) / 2.
+    # Both are consistent, so the searches may stop once the two queue minima sum to at least
+    # the best meeting cost found. With heuristic='none' this is bidirectional Dijkstra.
+    # Backward search runs over the reverse adjacency, reading weights through forward_edges
+    # so that closures apply, and skips inaccessible nodes just like the forward search.
+    started, looked_up = timestamps or (time.perf_counter(),) * 2
+    inf = float('inf')
+    reverse = get_reverse_graph(graph)
+    forward_estimate = make_heuristic(mall, graph, end_nodes, accessibility_required, heuristic)
+    backward_estimate = make_heuristic(mall, graph, start_nodes, accessibility_required, heuristic, reverse=True)
+    potentials: Dict[int, Optional[float]] = {}
 
-    for i in range(len(path) - 1):
-        current_node_id = path[i]
-        next_node_id = path[i + 1]
-        current_entity = mall.get_entity_by_node_id(current_node_id)
-        next_entity = mall.get_entity_by_node_id(next_node_id)
+    def potential(node: int) -> Optional[float]:
+        # None when either bound is inf: the node cannot lie on a route between the shops
+        if node in potentials:
+            return potentials[node]
+        to_end, from_start = forward_estimate(node), backward_estimate(node)
+        value = potentials[node] = (to_end - from_start) / 2 if to_end < inf and from_start < inf else None
+        return value
 
-        if not current_entity or not next_entity:
-            continue
+    # Per direction: (offsets, targets, weights, edge map or None, queue, costs, predecessors, settled)
+    forward = (graph.offsets, graph.targets, graph.weights, None, [], {}, {}, set())
+    backward = (reverse.offsets, reverse.targets, graph.weights, reverse.forward_edges, [], {}, {}, set())
+    for nodes, (_, _, _, _, heap, costs, came_from, _), sign in ((start_nodes, forward, 1), (end_nodes, backward, -1)):
+        for node in nodes:
+            node_potential = potential(node)
+            if node_potential is not None:
+                heapq.heappush(heap, (sign * node_potential, 0, node))
+                costs[node] = 0
+                came_from[node] = None
+    heuristic_ready = time.perf_counter()
 
-        # Get floor levels
-        if isinstance(current_entity, (Shop, CorridorNode)):
-            current_floor = current_entity.floor.level
-        elif isinstance(current_entity, Connector):
-            current_floor = int(current_node_id.split(' @ Level ')[-1])
+    accessible = graph.accessible
+    pushes = len(forward[4]) + len(backward[4])
+    filtered = 0
+    best_cost = inf
+    meeting = None
+    # Start and end shops can share a node, which neither search relaxes into
+    for node in start_nodes:
+        if node in backward[5]:
+            best_cost = 0
+            meeting = node
+    while forward[4] and backward[4] and forward[4][0][0] + backward[4][0][0] < best_cost:
+        # Advance the side with the smaller queue
+        if len(forward[4]) <= len(backward[4]):
+            side, other, sign = forward, backward, 1
         else:
-            current_floor = None
+            side, other, sign = backward, forward, -1
+        offsets, targets, weights, edge_map, heap, costs, came_from, closed = side
+        other_costs = other[5]
+        _, cost_so_far, current_node = heapq.heappop(heap)
+        if current_node in closed or costs[current_node] < cost_so_far:
+            continue
+        closed.add(current_node)
 
-        if isinstance(next_entity, (Shop, CorridorNode)):
-            next_floor = next_entity.floor.level
-        elif isinstance(next_entity, Connector):
-            next_floor = int(next_node_id.split(' @ Level ')[-1])
-        else:
-            next_floor = None
-
-        # Announce floor change
-        if previous_floor is not None and current_floor != previous_floor:
-            instructions.append(f"You are now on Floor {current_floor}.")
-
-        # Calculate direction
-        dx = next_entity.x - current_entity.x
-        dy = next_entity.y - current_entity.y
-        direction = math.degrees(math.atan2(dy, dx))
-
-        if previous_entity:
-            # Calculate previous direction
-            pdx = current_entity.x - previous_entity.x
-            pdy = current_entity.y - previous_entity.y
-            prev_direction = math.degrees(math.atan2(pdy, pdx))
-            angle_difference = (direction - prev_direction + 360) % 360
-
-            if angle_difference < 30 or angle_difference > 330:
-                turn = "Continue straight"
-            elif 30 <= angle_difference < 150:
-                turn = "Turn left"
-            elif 210 < angle_difference <= 330:
-                turn = "Turn right"
-            else:
-                turn = "Make a U-turn"
-
-            # Simplify entity descriptions
-            next_description = describe_entity(next_entity)
-            instructions.append(f"{turn} towards {next_description}")
-        else:
-            # First instruction
-            current_description = describe_entity(current_entity)
-            next_description = describe_entity(next_entity)
-            instructions.append(f"Start at {current_description}, head towards {next_description}")
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[edge]
+            if neighbor in closed:
+                continue
+            if accessibility_required and not accessible[neighbor]:
+                filtered += 1
+                continue
+            new_cost = cost_so_far + weights[edge if edge_map is None else edge_map[edge]]
+            if new_cost < costs.get(neighbor, inf):
+                neighbor_potential = potential(neighbor)
+                if neighbor_potential is None:
+                    continue
+                costs[neighbor] = new_cost
+                came_from[neighbor] = current_node
+                heapq.heappush(heap, (new_cost + sign * neighbor_potential, new_cost, neighbor))
+                pushes += 1
+                # A route through neighbor joins the two searches
+                other_cost = other_costs.get(neighbor)
+                if other_cost is not None and new_cost + other_cost < best_cost:
+                    best_cost = new_cost + other_cost
+                    meeting = neighbor
 
-        previous_entity = current_entity
-        previous_floor = current_floor
+    searched = time.perf_counter()
+    path = None
+    if meeting is not None:
+        path = reconstruct_path(forward[6], meeting)
+        node = backward[6][meeting]
+        while node is not None:
+            path.append(node)
+            node = backward[6][node]
+    if stats is not None:
+        record_search(
+            stats, 'bidirectional', path, (started, looked_up, heuristic_ready, searched, time.perf_counter()),
+            heap_pushes=pushes,
+            heap_pops=pushes - len(forward[4]) - len(backward[4]),
+            nodes_expanded=len(forward[7]) + len(backward[7]),
+            heuristic_calls=len(potentials),
+            accessibility_filtered=filtered
+        )
+    if path is None:
+        return "No path found between the shops."
+    return graph.to_node_ids(path)
 
-    # Add final instruction
-    last_entity = mall.get_entity_by_node_id(path[-1])
-    if last_entity:
-        last_description = describe_entity(last_entity)
-        instructions.append(f"You have arrived at {last_description}.")
+def record_search(
+    stats: Dict[str, object],
+    engine: str,
+    path: Optional[List[int]],
+    timestamps: Tuple[float, float, float, float, float],
+    heap_pushes: int = 0,
+    heap_pops: int = 0,
+    nodes_expanded: int = 0,
+    heuristic_calls: int = 0,
+    accessibility_filtered: int = 0
+):
+    # One query's record:
+    #   engine                  'astar', 'bidirectional', 'route_table', 'contraction_hierarchy',
+    #                           or 'lookup' for unknown shops
+    #   found, path_nodes       whether a route was found and its length in nodes
+    #   heap_pushes, heap_pops  A* priority queue traffic
+    #   stale_pops              pops of already settled or superseded entries
+    #   nodes_expanded          nodes settled and relaxed
+    #   heuristic_calls         distinct nodes the heuristic was evaluated for
+    #   accessibility_filtered  edges skipped because their target is not accessible
+    #   *_ms                    wall clock of lookup, heuristic setup, search and reconstruction
+    # timestamps are perf_counter readings at the start and after each of the four phases.
+    started, looked_up, heuristic_ready, searched, finished = timestamps
+    found = path is not None
+    stats['engine'] = engine
+    stats['found'] = found
+    stats['path_nodes'] = len(path) if found else 0
+    stats['heap_pushes'] = heap_pushes
+    stats['heap_pops'] = heap_pops
+    # The pop that reaches the target is neither stale nor expanded
+    stats['stale_pops'] = max(0, heap_pops - nodes_expanded - (1 if found and engine == 'astar' else 0))
+    stats['nodes_expanded'] = nodes_expanded
+    stats['heuristic_calls'] = heuristic_calls
+    stats['accessibility_filtered'] = accessibility_filtered
+    stats['lookup_ms'] = (looked_up - started) * 1000
+    stats['heuristic_ms'] = (heuristic_ready - looked_up) * 1000
+    stats['search_ms'] = (searched - heuristic_ready) * 1000
+    stats['reconstruct_ms'] = (finished - searched) * 1000
+    stats['total_ms'] = (finished - started) * 1000
 
+def make_heuristic(
+    mall: Mall,
+    graph: CompiledGraph,
+    end_nodes,
+    accessibility_required: bool = False,
+    heuristic: str = 'auto',
+    reverse: bool = False
+) -> Callable[[int], float]:
+    # Lower bound on the distance from a node to the nearest of end_nodes, or with reverse,
+    # from the nearest of end_nodes to the node
+    if heuristic not in ('auto', 'euclidean', 'none'):
+        raise ValueError(f"Unknown heuristic {heuristic!r}")
+    if heuristic == 'none':
+        return lambda node: 0.0
+    xs, ys, levels = graph.xs, graph.ys, graph.levels
+
+    # Straight-line distance plus the cheapest possible cost of the floor changes. The floor term
+    # must not exceed any vertical edge's weight per floor, otherwise settled nodes may be suboptimal.
+    floor_weight = graph.floor_weight
+    end_positions = list({(xs[end_node], ys[end_node], levels[end_node]) for end_node in end_nodes})
+
+    def euclidean(node: int) -> float:
+        x, y, level = xs[node], ys[node], levels[node]
+        min_distance = float('inf')
+        for end_x, end_y, end_level in end_positions:
+            distance = math.hypot(x - end_x, y - end_y) + (abs(level - end_level) * floor_weight)
+            if distance < min_distance:
+                min_distance = distance
+        return min_distance
+
+    landmarks = mall.landmarks
+    if heuristic == 'euclidean' or landmarks is None or accessibility_required not in landmarks:
+        return euclidean
+
+    # Both bounds are admissible and consistent, so their maximum is too
+    landmark_bound = landmarks[accessibility_required].heuristic(end_nodes, reverse)
+
+    def combined(node: int) -> float:
+        return max(euclidean(node), landmark_bound(node))
+
+    return combined
+
+def heuristic_violations(
+    graph: CompiledGraph,
+    heuristic: Callable[[int], float],
+    accessibility_required: bool = False,
+    tolerance: float = 1e-9
+) -> List[Tuple[int, int, float, float]]:
+    # Consistency check: every searchable edge u -> v must satisfy h(u) <= w(u, v) + h(v).
+    # Nodes estimated at inf are proven unable to reach the target and are skipped.
+    # Returns (u, v, h(u) - h(v), w(u, v)) for each edge that breaks it.
+    violations = []
+    for node in range(graph.node_count):
+        if accessibility_required and not graph.accessible[node]:
+            continue
+        node_estimate = heuristic(node)
+        if node_estimate == float('inf'):
+            continue
+        for neighbor, weight in graph.neighbors(node):
+            if accessibility_required and not graph.accessible[neighbor]:
+                continue
+            neighbor_estimate = heuristic(neighbor)
+            if node_estimate > weight + neighbor_estimate + tolerance:
+                violations.append((node, neighbor, node_estimate - neighbor_estimate, weight))
+    return violations
+
+def shortest_path_tree(
+    graph: CompiledGraph,
+    sources: List[int],
+    accessibility_required: bool = False,
+    targets: Optional[List[int]] = None
+) -> Tuple[List[float], List[int]]:
+    # Plain Dijkstra from one or more sources over the whole graph, or until every node in
+    # targets is settled. Returns (distance, predecessor) lists indexed by node; unreached
+    # nodes keep inf / -1.
+    offsets, neighbors, weights = graph.offsets, graph.targets, graph.weights
+    accessible = graph.accessible
+    distance = [float('inf')] * graph.node_count
+    predecessor = [-1] * graph.node_count
+    settled = bytearray(graph.node_count)
+
+    remaining = set(targets) if targets is not None else None
+
+    heap = []
+    for source in sources:
+        distance[source] = 0
+        heapq.heappush(heap, (0, source))
+
+    while heap:
+        cost_so_far, current_node = heapq.heappop(heap)
+        if settled[current_node]:
+            continue
+        settled[current_node] = 1
+        if remaining is not None:
+            remaining.discard(current_node)
+            if not remaining:
+                break
+        for edge in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = neighbors[edge]
+            if settled[neighbor]:
+                continue
+            if accessibility_required and not accessible[neighbor]:
+                continue
+            new_cost = cost_so_far + weights[edge]
+            if new_cost < distance[neighbor]:
+                distance[neighbor] = new_cost
+                predecessor[neighbor] = current_node
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    return distance, predecessor
+
+def reconstruct_path(came_from: Dict[int, Optional[int]], node: int) -> List[int]:
+    # Walk predecessor links back to a start node
+    path = []
+    while node is not None:
+        path.append(node)
+        node = came_from[node]
+    path.reverse()
+    return path
+
+# Turn kinds, indexing TURNS
+STRAIGHT, LEFT, RIGHT, U_TURN = range(4)
+TURNS = ["Continue straight", "Turn left", "Turn right", "Make a U-turn"]
+
+def generate_instructions(mall: Mall, path: List[str], merge_straight: bool = True) -> List[str]:
+    # One instruction per step, worded by the turn from the previous heading. With merge_straight
+    # a run of "Continue straight" steps along a corridor is given as one instruction.
+    graph = get_compiled_graph(mall)
+    index = graph.index
+    nodes = [index.get(node_id) for node_id in path]
+    xs, ys, levels = graph.xs, graph.ys, graph.levels
+
+    # Steps between known nodes, then every heading and turn in one pass over the coordinates
+    steps = [(current, following) for current, following in zip(nodes, nodes[1:])
+             if current is not None and following is not None]
+    if not steps:
+        return [f"You have arrived at {describe_node(graph, nodes[-1])}."] if nodes and nodes[-1] is not None else []
+    sources = [current for current, _ in steps]
+    headings = [math.degrees(math.atan2(ys[following] - ys[current], xs[following] - xs[current]))
+                for current, following in steps]
+    # Heading into each step's source from the previous step's source, like the turns at a node
+    arrivals = [math.degrees(math.atan2(ys[current] - ys[previous], xs[current] - xs[previous]))
+                for previous, current in zip(sources, sources[1:])]
+    turns = [turn_kind((heading - arrival + 360) % 360) for arrival, heading in zip(arrivals, headings[1:])]
+
+    templates = graph.instruction_templates
+    instructions = [f"Start at {describe_node(graph, steps[0][0])}, head towards {describe_node(graph, steps[0][1])}"]
+    merging = False
+    for step in range(1, len(steps)):
+        current, following = steps[step]
+        if levels[current] != levels[sources[step - 1]]:
+            instructions.append(f"You are now on Floor {levels[current]}.")
+            merging = False
+        turn = turns[step - 1]
+        if merge_straight and turn == STRAIGHT and graph.kinds[following] == KIND_CORRIDOR:
+            if merging:
+                continue
+            merging = True
+        else:
+            merging = False
+        key = (turn, following)
+        instruction = templates.get(key)
+        if instruction is None:
+            instruction = templates[key] = f"{TURNS[turn]} towards {describe_node(graph, following)}"
+        instructions.append(instruction)
+
+    if nodes[-1] is not None:
+        instructions.append(f"You have arrived at {describe_node(graph, nodes[-1])}.")
     return instructions
 
+def turn_kind(angle_difference: float) -> int:
+    # angle_difference: change of heading in degrees, counter-clockwise, in [0, 360)
+    if angle_difference < 30 or angle_difference > 330:
+        return STRAIGHT
+    if angle_difference < 150:
+        return LEFT
+    if angle_difference > 210:
+        return RIGHT
+    return U_TURN
+
+def describe_node(graph: CompiledGraph, node: int) -> str:
+    # describe_entity for a compiled node, computed once per graph
+    descriptions = graph.descriptions
+    if descriptions is None:
+        descriptions = graph.descriptions = [describe_entity(entity) for entity in graph.entities]
+    return descriptions[node]
+
 def describe_entity(entity: Union[Shop, Connector, CorridorNode]) -> str:
     if isinstance(entity, Shop):
         return f"{entity.name}"
@@ -174,3 +476,43 @@ def describe_entity(entity: Union[Shop, Connector, CorridorNode]) -> str:
     else:
         return "an unknown location"
 
+
+def check_targeted_trees(malls: int = 20, seed: int = 0) -> int:
+    # shortest_path_tree with targets must stop once they are settled and still give them their
+    # full-tree distances; checked on random synthetic malls. Returns the number of failures
+    # after printing each one.
+    # Imported here: data_loader imports this module through route_table
+    import random
+    from data_loader import load_mall_from_dict
+    from synthetic_mall import generate_mall_data
+    rng = random.Random(seed)
+    failures = 0
+    for mall_index in range(malls):
+        data = generate_mall_data(
+            floors=rng.randint(1, 4),
+            rows=rng.randint(1, 5),
+            columns=rng.randint(2, 7),
+            edge_keep=rng.choice([1.0, 0.9, 0.7]),
+            seed=rng.randrange(1 << 30)
+        )
+        graph = get_compiled_graph(load_mall_from_dict(data))
+        source = rng.randrange(graph.node_count)
+        accessibility_required = rng.random() < 0.5
+        distance, _ = shortest_path_tree(graph, [source], accessibility_required, [source])
+        reached = sum(1 for value in distance if value != float('inf'))
+        if reached != 1:
+            failures += 1
+            print(f"Mall {mall_index}: a search whose only target is its source reached {reached} nodes")
+        full, _ = shortest_path_tree(graph, [source], accessibility_required)
+        targets = rng.sample(range(graph.node_count), min(3, graph.node_count))
+        targeted, _ = shortest_path_tree(graph, [source], accessibility_required, targets)
+        for target in targets:
+            if targeted[target] != full[target]:
+                failures += 1
+                print(f"Mall {mall_index}: target {target} got {targeted[target]} instead of {full[target]}")
+    return failures
+
+if __name__ == "__main__":
+    failures = check_targeted_trees()
+    print(f"{failures} failures")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Union
+from models import Mall
+from pathfinding import find_shortest_path, generate_instructions
+
+# (graph version, start name, end name, accessibility_required)
+CacheKey = Tuple[int, str, str, bool]
+
+class RouteCache:
+    # Bounded LRU cache of find_shortest_path results and their instructions for one mall.
+    # Keys carry Mall.graph_version, and the whole cache is dropped as soon as the version
+    # moves, so a rebuild or closure can never serve a stale route.
+    def __init__(self, mall: Mall, max_entries: int = 1024):
+        self.mall = mall
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # CacheKey: [path or message, instructions or None]
+        self._lock = threading.Lock()
+        self._version = mall.graph_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key(self, start_shop_name: str, end_shop_name: str, accessibility_required: bool) -> CacheKey:
+        # Shop lookup is case-insensitive, so the key is too
+        return (self.mall.graph_version, start_shop_name.casefold(), end_shop_name.casefold(), bool(accessibility_required))
+
+    def lookup(self, start_shop_name: str, end_shop_name: str, accessibility_required: bool = False) -> Optional[list]:
+        # [path or message, instructions or None] if cached for the current graph version
+        key = self._key(start_shop_name, end_shop_name, accessibility_required)
+        with self._lock:
+            if self._version != self.mall.graph_version:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._version = self.mall.graph_version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        start_shop_name: str,
+        end_shop_name: str,
+        accessibility_required: bool,
+        path: Union[List[str], str],
+        instructions: Optional[List[str]] = None,
+        graph_version: Optional[int] = None
+    ) -> list:
+        # graph_version is the version the route was computed against; stale results are not kept
+        key = self._key(start_shop_name, end_shop_name, accessibility_required)
+        entry = [path, instructions]
+        with self._lock:
+            if graph_version is None or graph_version == key[0]:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def _get_entry(self, start_shop_name: str, end_shop_name: str, accessibility_required: bool) -> list:
+        entry = self.lookup(start_shop_name, end_shop_name, accessibility_required)
+        if entry is not None:
+            return entry
+        # Search outside the lock so concurrent misses do not serialise
+        graph_version = self.mall.graph_version
+        path = find_shortest_path(self.mall, start_shop_name, end_shop_name, accessibility_required)
+        return self.store(start_shop_name, end_shop_name, accessibility_required, path, graph_version=graph_version)
+
+    def find_shortest_path(
+        self,
+        start_shop_name: str,
+        end_shop_name: str,
+        accessibility_required: bool = False
+    ) -> Union[List[str], str]:
+        return self._get_entry(start_shop_name, end_shop_name, accessibility_required)[0]
+
+    def generate_instructions(
+        self,
+        start_shop_name: str,
+        end_shop_name: str,
+        accessibility_required: bool = False
+    ) -> Optional[List[str]]:
+        # Instructions for the cached route, or None when there is no route
+        entry = self._get_entry(start_shop_name, end_shop_name, accessibility_required)
+        if entry[1] is None and isinstance(entry[0], list):
+            entry[1] = generate_instructions(self.mall, entry[0])
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+    def __repr__(self):
+        return f"RouteCache with {len(self._entries)}/{self.max_entries} entries"
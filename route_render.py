@@ -0,0 +1,71 @@
+import functools
+import io
+import numpy as np
+import matplotlib.image as mimage
+from typing import List, Optional, Tuple
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from models import Mall
+from compiled_graph import get_compiled_graph
+from mall_pool import mall_process_pool, worker_state
+from visualization import PATH_COLOR, draw_scene, route_coordinates
+
+# zlib level for PNG output: encoding dominates the cost of a blitted frame, and level 1 is
+# about twice as fast as the default 6 for files around 10% larger
+PNG_COMPRESS_LEVEL = 1
+
+class RouteRenderer:
+    # Off-screen route maps for one mall. The static scene is drawn once, with one collection
+    # per kind of geometry instead of one artist per shop or edge, and kept as a pixel buffer;
+    # each PNG then only restores that buffer and draws the route line over it. SVG output is
+    # vector, so it redraws the scene with the route through savefig.
+    def __init__(self, mall: Mall, figsize: Tuple[float, float] = (12, 10), dpi: int = 100):
+        self.mall = mall
+        self.graph = get_compiled_graph(mall)
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot(111, projection='3d')
+        draw_scene(self.axes, mall)
+        self.figure.tight_layout()
+        # Excluded from canvas.draw while animated, but still drawn by savefig
+        self.route_line = self.axes.plot([], [], [], color=PATH_COLOR, linewidth=3, animated=True)[0]
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def render(self, path: Optional[List[str]], format: str = 'png') -> bytes:
+        # Image bytes of the scene with path (node IDs, as from find_shortest_path) drawn on it;
+        # None or an empty path gives the bare scene
+        xs, ys, zs = route_coordinates(self.mall, path or [])
+        self.route_line.set_data_3d(xs, ys, zs)
+        buffer = io.BytesIO()
+        if format == 'png':
+            self.canvas.restore_region(self.background)
+            self.axes.draw_artist(self.route_line)
+            pixels = np.asarray(self.canvas.buffer_rgba())
+            mimage.imsave(buffer, pixels, format='png', dpi=self.dpi, pil_kwargs={'compress_level': PNG_COMPRESS_LEVEL})
+        elif format == 'svg':
+            self.figure.savefig(buffer, format='svg')
+        else:
+            raise ValueError(f"Unsupported format {format!r}; use 'png' or 'svg'")
+        return buffer.getvalue()
+
+def render_routes(
+    mall: Mall,
+    paths: List[Optional[List[str]]],
+    format: str = 'png',
+    processes: Optional[int] = None,
+    figsize: Tuple[float, float] = (12, 10),
+    dpi: int = 100
+) -> List[bytes]:
+    # Image bytes for each path, in order. processes > 1 spreads the paths over a process pool
+    # in which every worker draws the static scene once.
+    if processes is not None and processes > 1 and len(paths) > 1:
+        with mall_process_pool(mall, processes, functools.partial(RouteRenderer, figsize=figsize, dpi=dpi)) as executor:
+            chunksize = max(1, len(paths) // (processes * 4))
+            return list(executor.map(_worker_render, paths, [format] * len(paths), chunksize=chunksize))
+    renderer = RouteRenderer(mall, figsize, dpi)
+    return [renderer.render(path, format) for path in paths]
+
+def _worker_render(path: Optional[List[str]], format: str) -> bytes:
+    return worker_state().render(path, format)
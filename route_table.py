@@ -0,0 +1,80 @@
+from array import array
+from typing import List, Dict, Tuple, Optional
+from models import Mall
+from compiled_graph import CompiledGraph, KIND_SHOP, get_compiled_graph
+from pathfinding import shortest_path_tree
+
+class RouteTable:
+    # Shop-to-shop distances and shortest-path trees, one per shop node and mode.
+    # distances[mode][row][column] is the route length from shop row to shop column,
+    # predecessors[mode][row] is the Dijkstra predecessor array rooted at shop row.
+    def __init__(self, graph: CompiledGraph, shop_nodes: List[int]):
+        self.graph = graph
+        self.shop_nodes = shop_nodes
+        self.rows: Dict[int, int] = {node: row for row, node in enumerate(shop_nodes)}  # shop node: row
+        self.distances: Dict[bool, List[array]] = {}  # accessibility_required: rows of distances
+        self.predecessors: Dict[bool, List[array]] = {}  # accessibility_required: rows of predecessors
+
+    def covers(self, nodes: List[int]) -> bool:
+        return all(node in self.rows for node in nodes)
+
+    def distance(self, start_node: int, end_node: int, accessibility_required: bool = False) -> float:
+        return self.distances[accessibility_required][self.rows[start_node]][self.rows[end_node]]
+
+    def route(self, start_nodes: List[int], end_nodes, accessibility_required: bool = False) -> Optional[List[int]]:
+        # Pick the closest (start, end) pair from the table, then walk the predecessor array back
+        distances = self.distances[accessibility_required]
+        best_distance = float('inf')
+        best_pair = None
+        for start_node in start_nodes:
+            row = distances[self.rows[start_node]]
+            for end_node in end_nodes:
+                distance = row[self.rows[end_node]]
+                if distance < best_distance:
+                    best_distance = distance
+                    best_pair = (start_node, end_node)
+        if best_pair is None:
+            return None
+
+        start_node, node = best_pair
+        predecessor = self.predecessors[accessibility_required][self.rows[start_node]]
+        path = [node]
+        while node != start_node:
+            node = predecessor[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    def edges_changed(self, edges: List[Tuple[int, int]], shortened: bool, modes: List[bool]):
+        # Recompute only the rows that can be affected: a disabled or lengthened edge matters to
+        # the trees that use it, while an enabled or shortened edge may shorten any tree of the mode
+        for accessibility_required in modes:
+            predecessor_rows = self.predecessors[accessibility_required]
+            for row, predecessor in enumerate(predecessor_rows):
+                if shortened or any(predecessor[neighbor] == node for node, neighbor in edges):
+                    self._build_row(accessibility_required, row)
+
+    def _build_row(self, accessibility_required: bool, row: int):
+        distance, predecessor = shortest_path_tree(self.graph, [self.shop_nodes[row]], accessibility_required)
+        self.distances[accessibility_required][row] = array('d', (distance[node] for node in self.shop_nodes))
+        self.predecessors[accessibility_required][row] = array('l', predecessor)
+
+    def __repr__(self):
+        return f"RouteTable for {len(self.shop_nodes)} shop nodes"
+
+def build_route_table(graph: CompiledGraph) -> RouteTable:
+    shop_nodes = [node for node in range(graph.node_count) if graph.kinds[node] == KIND_SHOP]
+    table = RouteTable(graph, shop_nodes)
+    for accessibility_required in (False, True):
+        table.distances[accessibility_required] = [None] * len(shop_nodes)
+        table.predecessors[accessibility_required] = [None] * len(shop_nodes)
+        for row in range(len(shop_nodes)):
+            table._build_row(accessibility_required, row)
+    return table
+
+def precompute_route_table(mall: Mall) -> RouteTable:
+    # Run after Mall.build_graph; find_shortest_path answers shop queries from the table
+    # until the graph is rebuilt
+    table = build_route_table(get_compiled_graph(mall))
+    mall.route_table = table
+    return table
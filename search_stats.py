@@ -0,0 +1,97 @@
+import math
+import threading
+from collections import Counter, deque
+from typing import List, Dict, Optional, Union
+from models import Mall
+from pathfinding import find_shortest_path
+
+COUNTERS = (
+    'heap_pushes', 'heap_pops', 'stale_pops', 'nodes_expanded',
+    'heuristic_calls', 'accessibility_filtered', 'path_nodes'
+)
+TIMERS = ('lookup_ms', 'heuristic_ms', 'search_ms', 'reconstruct_ms', 'total_ms')
+
+def bucket(value: float) -> str:
+    # Power-of-two histogram bucket label: '0', '1', '2', '4', ... meaning values up to that bound
+    if value <= 0:
+        return '0'
+    return str(2 ** max(0, math.ceil(math.log2(value))))
+
+class SearchProfiler:
+    # Collects find_shortest_path records into totals and power-of-two histograms, and keeps
+    # the most recent records for inspection. Timers are bucketed in microseconds.
+    #
+    # Reading the numbers: a query that expands most of the graph and finds no route points at
+    # disconnected corridors or a missing connector; many stale pops or expansions far above
+    # path_nodes on found routes point at a weak heuristic, usually bad node coordinates.
+    def __init__(self, keep_records: int = 100):
+        self.records: deque = deque(maxlen=keep_records)
+        self.queries = 0
+        self.engines: Counter = Counter()
+        self.not_found: Counter = Counter()  # engine: queries without a route
+        self.totals: Dict[str, float] = {name: 0 for name in COUNTERS + TIMERS}
+        self.histograms: Dict[str, Counter] = {name: Counter() for name in COUNTERS + TIMERS}
+        self._lock = threading.Lock()
+
+    def find_shortest_path(
+        self,
+        mall: Mall,
+        start_shop_name: str,
+        end_shop_name: str,
+        accessibility_required: bool = False,
+        heuristic: str = 'auto'
+    ) -> Union[List[str], str]:
+        stats = {}
+        path = find_shortest_path(mall, start_shop_name, end_shop_name, accessibility_required, heuristic, stats=stats)
+        stats['start'] = start_shop_name
+        stats['end'] = end_shop_name
+        stats['accessible'] = accessibility_required
+        self.record(stats)
+        return path
+
+    def record(self, stats: Dict[str, object]):
+        with self._lock:
+            self.queries += 1
+            self.engines[stats['engine']] += 1
+            if not stats['found']:
+                self.not_found[stats['engine']] += 1
+            for name in COUNTERS:
+                self.totals[name] += stats[name]
+                self.histograms[name][bucket(stats[name])] += 1
+            for name in TIMERS:
+                self.totals[name] += stats[name]
+                self.histograms[name][bucket(stats[name] * 1000)] += 1
+            self.records.append(dict(stats))
+
+    def summary(self) -> Dict[str, object]:
+        # JSON-ready aggregate; histogram buckets are sorted by their bound
+        with self._lock:
+            queries = self.queries or 1
+            return {
+                'queries': self.queries,
+                'engines': dict(self.engines),
+                'not_found': dict(self.not_found),
+                'means': {name: round(total / queries, 4) for name, total in self.totals.items()},
+                'histograms': {
+                    name: dict(sorted(histogram.items(), key=lambda item: int(item[0])))
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        with self._lock:
+            records = list(self.records)
+        return records[-limit:] if limit else records
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            self.queries = 0
+            self.engines.clear()
+            self.not_found.clear()
+            for name in self.totals:
+                self.totals[name] = 0
+                self.histograms[name].clear()
+
+    def __repr__(self):
+        return f"SearchProfiler with {self.queries} queries"
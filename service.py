@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Tuple, Optional, Union, List
+from urllib.parse import urlsplit, parse_qs
+from models import Mall
+from mall_binary import load_mall
+from mall_pool import mall_process_pool, worker_state
+from pathfinding import find_shortest_path, generate_instructions
+from route_cache import RouteCache
+
+# Minimal HTTP/JSON routing service. The mall is loaded once and kept in memory;
+# searches run in a worker pool so the event loop only parses requests and writes responses.
+#
+#   GET  /route?start=KFC&end=Haidilao&accessible=1   path and instructions
+#   GET  /search?q=kf                                 shop name search
+#   GET  /stats                                       cache statistics
+#   POST /reload   {"data": "mall_data.json"}         load a new mall and swap it in
+#
+# Reloads only read files inside the data directory (by default the one holding the first mall);
+# relative paths are taken from there.
+#
+# python service.py --data mall_data.json --port 8080 --workers 4
+
+class MallState:
+    # Everything tied to one loaded mall. Requests take a reference to the current state when
+    # they start, so a reload never changes the mall under an in-flight request.
+    def __init__(self, data_path: str, mall: Mall, executor: Executor, cache_size: int):
+        self.data_path = data_path
+        self.mall = mall
+        self.executor = executor
+        self.cache = RouteCache(mall, cache_size)
+        self.pending: Dict[Tuple[str, str, bool], asyncio.Future] = {}  # searches in flight, shared by identical requests
+
+class RoutingService:
+    def __init__(self, data_path: str, workers: int = 0, cache_size: int = 1024, data_dir: Optional[str] = None):
+        # workers > 0 searches in that many processes, each with its own copy of the mall;
+        # workers == 0 searches in a thread pool against the shared in-process mall
+        self.workers = workers
+        self.cache_size = cache_size
+        self.data_dir = os.path.realpath(data_dir or os.path.dirname(os.path.abspath(data_path)))
+        self.state = self._load_state(data_path)
+        self._reload_lock = asyncio.Lock()
+
+    def _load_state(self, data_path: str) -> MallState:
+        mall = load_mall(data_path)
+        if self.workers > 0:
+            executor = mall_process_pool(mall, self.workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=4)
+        return MallState(data_path, mall, executor, self.cache_size)
+
+    async def route(self, start_shop_name: str, end_shop_name: str, accessibility_required: bool) -> Tuple[int, dict]:
+        state = self.state
+        entry = state.cache.lookup(start_shop_name, end_shop_name, accessibility_required)
+        if entry is None:
+            graph_version = state.mall.graph_version
+            key = (start_shop_name.casefold(), end_shop_name.casefold(), accessibility_required)
+            search = state.pending.get(key)
+            if search is None:
+                if self.workers > 0:
+                    task = _worker_route
+                else:
+                    task = functools.partial(compute_route, state.mall)
+                search = asyncio.get_running_loop().run_in_executor(
+                    state.executor, task, start_shop_name, end_shop_name, accessibility_required
+                )
+                state.pending[key] = search
+                search.add_done_callback(lambda _: state.pending.pop(key, None))
+            # Shielded so that one client going away does not cancel the search for the others
+            path, instructions = await asyncio.shield(search)
+            entry = state.cache.store(
+                start_shop_name, end_shop_name, accessibility_required, path, instructions, graph_version
+            )
+
+        path, instructions = entry
+        body = {'start': start_shop_name, 'end': end_shop_name, 'accessible': accessibility_required}
+        if not isinstance(path, list):
+            body['error'] = path
+            return 404, body
+        body['path'] = path
+        body['instructions'] = instructions
+        return 200, body
+
+    async def reload(self, data_path: Optional[str] = None) -> Tuple[int, dict]:
+        # Build the new state off the event loop, then swap it in with one assignment.
+        # The old pool finishes the searches already handed to it before shutting down.
+        async with self._reload_lock:
+            old_state = self.state
+            if data_path is not None:
+                resolved = os.path.realpath(os.path.join(self.data_dir, data_path))
+                if os.path.commonpath([self.data_dir, resolved]) != self.data_dir:
+                    return 400, {'error': f"{data_path} is outside the data directory"}
+                data_path = resolved
+            loop = asyncio.get_running_loop()
+            try:
+                new_state = await loop.run_in_executor(None, self._load_state, data_path or old_state.data_path)
+            except (OSError, ValueError, KeyError) as error:
+                return 500, {'error': f"Reload failed: {error}"}
+            self.state = new_state
+            old_state.executor.shutdown(wait=False)
+            return 200, {'reloaded': new_state.data_path}
+
+    def search(self, query: str) -> Tuple[int, dict]:
+        return 200, self.state.mall.search_shops(query)
+
+    def stats(self) -> Tuple[int, dict]:
+        state = self.state
+        return 200, {'data': state.data_path, 'graph_version': state.mall.graph_version, 'cache': state.cache.stats()}
+
+    async def handle(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if method == 'GET' and url.path == '/route':
+            if 'start' not in query or 'end' not in query:
+                return 400, {'error': "start and end are required"}
+            accessible = query.get('accessible', '0').lower() in ('1', 'true', 'yes')
+            return await self.route(query['start'], query['end'], accessible)
+        if method == 'GET' and url.path == '/search':
+            return self.search(query.get('q', ''))
+        if method == 'GET' and url.path == '/stats':
+            return self.stats()
+        if method == 'POST' and url.path == '/reload':
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'error': "Body must be JSON"}
+            if not isinstance(payload, dict):
+                return 400, {'error': "Body must be a JSON object"}
+            data_path = payload.get('data')
+            if data_path is not None and not isinstance(data_path, str):
+                return 400, {'error': "data must be a file path"}
+            return await self.reload(data_path)
+        return 404, {'error': f"No endpoint {method} {url.path}"}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body cannot be skipped without its length, so the connection ends here
+                    await self._respond(writer, 400, {'error': "Invalid Content-Length"}, False)
+                    break
+                body = await reader.readexactly(length)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    status, payload = await self.handle(method, target, body)
+                except Exception as error:
+                    status, payload = 500, {'error': repr(error)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+        body = json.dumps(payload).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}.get(status, '')
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+def compute_route(
+    mall: Mall,
+    start_shop_name: str,
+    end_shop_name: str,
+    accessibility_required: bool
+) -> Tuple[Union[List[str], str], Optional[List[str]]]:
+    path = find_shortest_path(mall, start_shop_name, end_shop_name, accessibility_required)
+    instructions = generate_instructions(mall, path) if isinstance(path, list) else None
+    return path, instructions
+
+def _worker_route(start_shop_name: str, end_shop_name: str, accessibility_required: bool):
+    return compute_route(worker_state(), start_shop_name, end_shop_name, accessibility_required)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mall Navigation Service")
+    parser.add_argument("--data", default="mall_data.json", help="Mall JSON or compiled .mallbin file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=0, help="Search processes (0 searches in threads)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Cached routes")
+    parser.add_argument("--data-dir", help="Directory /reload may load from (default: the directory of --data)")
+    args = parser.parse_args()
+
+    async def run():
+        service = RoutingService(args.data, workers=args.workers, cache_size=args.cache_size, data_dir=args.data_dir)
+        print(f"Serving {args.data} on http://{args.host}:{args.port}")
+        await service.serve(args.host, args.port)
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import math
+from typing import List, Dict, Tuple, Optional, Any
+
+class SpatialIndex:
+    # Uniform grid over the (x, y) positions of a floor's corridor nodes. Queries scan rings of
+    # cells outwards from the query point and stop as soon as no unvisited cell can hold a
+    # closer node. Ties are broken by insertion order, like a linear scan would.
+    def __init__(self, items: List[Any], cell_size: Optional[float] = None):
+        self.items = items
+        self.cells: Dict[Tuple[int, int], List[int]] = {}  # (column, row): item indices
+        if not items:
+            self.min_x = self.min_y = 0.0
+            self.cell_size = 1.0
+            self.columns = self.rows = 0
+            return
+        xs = [item.x for item in items]
+        ys = [item.y for item in items]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width, height = max(xs) - self.min_x, max(ys) - self.min_y
+        if cell_size is None:
+            # Aim for about sqrt(n) cells along the longer side, so that nodes along one straight
+            # corridor (zero height) still get cells of a sensible size
+            cell_size = max(width, height) / math.sqrt(len(items)) or 1.0
+        self.cell_size = cell_size
+        self.columns = int(width // cell_size) + 1
+        self.rows = int(height // cell_size) + 1
+        for index, item in enumerate(items):
+            self.cells.setdefault(self._cell(item.x, item.y), []).append(index)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        column = min(max(int((x - self.min_x) // self.cell_size), 0), self.columns - 1)
+        row = min(max(int((y - self.min_y) // self.cell_size), 0), self.rows - 1)
+        return column, row
+
+    def _ring(self, center: Tuple[int, int], radius: int):
+        # Cells at Chebyshev distance radius from center, leaving out those outside the grid
+        column, row = center
+        if radius == 0:
+            yield center
+            return
+        columns = range(max(column - radius, 0), min(column + radius, self.columns - 1) + 1)
+        for r in (row - radius, row + radius):
+            if 0 <= r < self.rows:
+                for c in columns:
+                    yield c, r
+        rows = range(max(row - radius + 1, 0), min(row + radius - 1, self.rows - 1) + 1)
+        for c in (column - radius, column + radius):
+            if 0 <= c < self.columns:
+                for r in rows:
+                    yield c, r
+
+    def _search(self, x: float, y: float, k: Optional[int], max_distance: float) -> List[Tuple[float, int]]:
+        # (distance, item index) pairs, closest first, for at most k items within max_distance
+        found: List[Tuple[float, int]] = []
+        if not self.items:
+            return found
+        center = self._cell(x, y)
+        max_ring = max(self.columns, self.rows)
+        for radius in range(max_ring + 1):
+            # Every cell outside the rings visited so far is at least this far away
+            bound = (radius - 1) * self.cell_size if radius else 0.0
+            if bound > max_distance:
+                break
+            if k is not None and len(found) >= k:
+                found.sort()
+                if found[k - 1][0] < bound:
+                    break
+            for cell in self._ring(center, radius):
+                for index in self.cells.get(cell, ()):
+                    item = self.items[index]
+                    distance = math.hypot(x - item.x, y - item.y)
+                    if distance <= max_distance:
+                        found.append((distance, index))
+        found.sort()
+        return found if k is None else found[:k]
+
+    def nearest(self, x: float, y: float) -> Optional[Any]:
+        found = self._search(x, y, 1, float('inf'))
+        return self.items[found[0][1]] if found else None
+
+    def k_nearest(self, x: float, y: float, k: int) -> List[Any]:
+        return [self.items[index] for _, index in self._search(x, y, k, float('inf'))]
+
+    def within_radius(self, x: float, y: float, radius: float) -> List[Any]:
+        return [self.items[index] for _, index in self._search(x, y, None, radius)]
+
+    def __repr__(self):
+        return f"SpatialIndex with {len(self.items)} items in {self.columns}x{self.rows} cells"
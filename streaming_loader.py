@@ -0,0 +1,119 @@
+import json
+from typing import List, Tuple, Optional, Iterable, Iterator, Callable, TextIO
+from models import Mall
+from data_loader import MallBuilder, LoadDiagnostic, finish_loading
+
+# Characters read at a time; a value that does not fit is retried with twice as much
+CHUNK_SIZE = 1 << 20
+
+class JsonStream:
+    # Incremental reader for a document whose top level is an object. Only the structure around
+    # the values of interest is walked by hand; each array element is decoded on its own with
+    # json.JSONDecoder.raw_decode, so memory holds one element plus the read buffer.
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.offset = 0  # Characters dropped from the front of the buffer
+        self.eof = False
+
+    def _read(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has been consumed before growing the buffer
+        self.offset += self.position
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        # Next non-whitespace character, '' at the end of the input
+        while True:
+            buffer, position = self.buffer, self.position
+            while position < len(buffer) and buffer[position] in ' \t\n\r':
+                position += 1
+            self.position = position
+            if position < len(buffer) or not self._read(self.chunk_size):
+                return buffer[position:position + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at character {self.offset + self.position}, found {character!r}")
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number ending with the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read(size)
+            size *= 2
+
+    def members(self) -> Iterator[str]:
+        # Keys of the object starting here; the caller must consume each member's value
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self) -> Iterator:
+        # Decoded elements of the array starting here
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+def load_mall_streaming(
+    file_path: str,
+    levels: Optional[Iterable[int]] = None,
+    floor_filter: Optional[Callable[[dict], bool]] = None,
+    precompute_routes: bool = False,
+    build: bool = True,
+    landmark_count: int = 0,
+    chunk_size: int = CHUNK_SIZE
+) -> Tuple[Mall, List[LoadDiagnostic]]:
+    # Load a mall_data.json document one floor at a time. Floors not in levels, or rejected by
+    # floor_filter, are decoded and discarded without building anything. Returns the mall and
+    # the diagnostics for every reference or field that could not be loaded.
+    builder = MallBuilder(levels, floor_filter)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f, chunk_size)
+        for key in stream.members():
+            if key == 'floors':
+                for i, floor_data in enumerate(stream.elements()):
+                    builder.add_floor(floor_data, f"floors[{i}]")
+            elif key == 'connectors':
+                for i, connector_data in enumerate(stream.elements()):
+                    builder.add_connector(connector_data, f"connectors[{i}]")
+            else:
+                stream.value()
+        if stream.peek():
+            raise ValueError(f"Unexpected data after the document at character {stream.offset + stream.position}")
+    mall = finish_loading(builder.finish(), precompute_routes, build, landmark_count)
+    return mall, builder.diagnostics
@@ -0,0 +1,95 @@
+import random
+from typing import Dict, List, Optional
+
+DEFAULT_CONNECTOR_MIX = {'elevator': 1, 'escalator': 2, 'stairs': 1}
+
+def generate_mall_data(
+    floors: int = 3,
+    rows: int = 4,
+    columns: int = 6,
+    shops_per_floor: int = 6,
+    connectors: int = 4,
+    connector_mix: Optional[Dict[str, int]] = None,
+    spacing: float = 40,
+    edge_keep: float = 1.0,
+    seed: Optional[int] = None
+) -> dict:
+    # Random mall in the mall_data.json schema: each floor is a rows x columns corridor grid,
+    # one corridor per row, with cross-corridor links between neighbouring rows.
+    rng = random.Random(seed)
+    connector_mix = connector_mix or DEFAULT_CONNECTOR_MIX
+    width = (columns - 1) * spacing
+    depth = (rows - 1) * spacing
+    levels = list(range(1, floors + 1))
+
+    data = {'floors': [], 'connectors': []}
+    floor_connectors: Dict[int, List[str]] = {level: [] for level in levels}
+
+    # Connectors, with the floors they stop at
+    types = [connector_type for connector_type, count in connector_mix.items() for _ in range(count)]
+    for i in range(connectors if floors > 1 else 0):
+        connector_type = rng.choice(types)
+        name = f"{connector_type.capitalize()}{i + 1}"
+        if connector_type == 'elevator':
+            stops = levels
+            direction = 'both'
+            accessible = True
+        elif connector_type == 'escalator':
+            low = rng.choice(levels[:-1])
+            stops = [low, low + 1]
+            direction = rng.choice(['up', 'down', 'both'])
+            accessible = rng.random() < 0.5
+        else:
+            low = rng.choice(levels[:-1])
+            high = rng.randint(low + 1, levels[-1])
+            stops = list(range(low, high + 1))
+            direction = 'both'
+            accessible = False
+        data['connectors'].append({
+            'name': name,
+            'type': connector_type,
+            'accessible': accessible,
+            'direction': direction,
+            'x': round(rng.uniform(0, width), 1),
+            'y': round(rng.uniform(0, depth), 1)
+        })
+        for level in stops:
+            floor_connectors[level].append(name)
+
+    for level in levels:
+        corridors = []
+        for row in range(rows):
+            corridor_id = f"F{level}R{row + 1}"
+            nodes = []
+            connections = []
+            for column in range(columns):
+                node_id = f"{corridor_id}N{column + 1}"
+                nodes.append({
+                    'id': node_id,
+                    'x': round(column * spacing + rng.uniform(-spacing, spacing) * 0.1, 1),
+                    'y': round(row * spacing + rng.uniform(-spacing, spacing) * 0.1, 1)
+                })
+                if column > 0 and rng.random() < edge_keep:
+                    connections.append({'from': f"{corridor_id}N{column}", 'to': node_id})
+                # Link down to the next row's corridor
+                if row + 1 < rows and rng.random() < edge_keep:
+                    connections.append({'from': node_id, 'to': f"F{level}R{row + 2}N{column + 1}"})
+            corridors.append({'id': corridor_id, 'nodes': nodes, 'connections': connections})
+
+        shops = []
+        for i in range(shops_per_floor):
+            shops.append({
+                'name': f"Shop {level}-{i + 1}",
+                'x': round(rng.uniform(0, width), 1),
+                'y': round(rng.uniform(0, depth), 1)
+            })
+        # Chains with a branch on every floor share a name across floors
+        shops.append({'name': "Chain Store", 'x': round(rng.uniform(0, width), 1), 'y': round(rng.uniform(0, depth), 1)})
+
+        data['floors'].append({
+            'level': level,
+            'shops': shops,
+            'connectors': floor_connectors[level],
+            'corridors': corridors
+        })
+    return data
@@ -0,0 +1,275 @@
+from typing import List, Dict, Tuple, Optional, Union, Callable
+from models import Mall
+from compiled_graph import CompiledGraph, get_compiled_graph
+from pathfinding import generate_instructions, shortest_path_tree
+
+# Largest number of stops ordered exactly with Held-Karp; longer lists use nearest neighbour and 2-opt
+EXACT_STOP_LIMIT = 10
+
+class Tour:
+    def __init__(self, order: List[str], distance: float, path: List[str], instructions: List[str], exact: bool):
+        self.order = order  # Shop names in visiting order, including a fixed start and end
+        self.distance = distance
+        self.path = path  # Node IDs of the whole tour
+        self.instructions = instructions  # generate_instructions for each leg, one after the other
+        self.exact = exact  # True when the order is proven optimal
+
+    def __repr__(self):
+        return f"Tour {' -> '.join(self.order)} ({self.distance:.1f})"
+
+def plan_tour(
+    mall: Mall,
+    shop_names: List[str],
+    start_shop_name: Optional[str] = None,
+    end_shop_name: Optional[str] = None,
+    accessibility_required: bool = False,
+    exact_stop_limit: int = EXACT_STOP_LIMIT
+) -> Union[Tour, str]:
+    # Shortest walk that visits every shop in shop_names, from start_shop_name and to
+    # end_shop_name when given (they may be the same shop for a round trip), otherwise from and
+    # to whichever stop is best. A shop with branches on several floors is visited at one of them.
+    # Distances come from the route table or contraction hierarchy when built; on large malls,
+    # keep_contraction_hierarchies (contraction_hierarchy.py) keeps a hierarchy ready in the
+    # background, without which a tour of 15 stops takes one Dijkstra tree per stop.
+    graph = get_compiled_graph(mall)
+    seen = {name.casefold() for name in (start_shop_name, end_shop_name) if name is not None}
+    stops = []
+    for name in shop_names:
+        if name.casefold() not in seen:
+            seen.add(name.casefold())
+            stops.append(name)
+    if not seen:
+        return "No shops to visit."
+    names = stops + [name for name in (start_shop_name, end_shop_name) if name is not None]
+    groups = [graph.shop_nodes(name) for name in names]
+    if not all(groups):
+        return "One or more shops are not in the mall."
+
+    # Vertices of the tour problem are shop nodes: one per shop and floor
+    vertices = sorted({node for group in groups for node in group})
+    position = {node: vertex for vertex, node in enumerate(vertices)}
+    stop_groups = [[position[node] for node in group] for group in groups[:len(stops)]]
+    start_group = [position[node] for node in groups[len(stops)]] if start_shop_name is not None else None
+    end_group = [position[node] for node in groups[-1]] if end_shop_name is not None else None
+
+    matrix, leg = distance_matrix(mall, graph, vertices, accessibility_required)
+    if len(stops) <= exact_stop_limit:
+        sequence = held_karp(matrix, stop_groups, start_group, end_group)
+        exact = True
+    else:
+        sequence = nearest_neighbour_two_opt(matrix, stop_groups, start_group, end_group)
+        exact = False
+    distance = sequence_cost(matrix, sequence)
+    if distance == float('inf'):
+        return "No tour reaches every shop."
+
+    path = []
+    instructions = []
+    for source, target in zip(sequence, sequence[1:]):
+        if source == target:
+            continue
+        leg_path = graph.to_node_ids(leg(vertices[source], vertices[target]))
+        path.extend(leg_path[1:] if path else leg_path)
+        instructions.extend(generate_instructions(mall, leg_path))
+    if not path:
+        path = [graph.node_ids[vertices[sequence[0]]]]
+
+    order = [graph.entities[vertices[vertex]].name for vertex in sequence]
+    return Tour(order, distance, path, instructions, exact)
+
+def distance_matrix(
+    mall: Mall,
+    graph: CompiledGraph,
+    nodes: List[int],
+    accessibility_required: bool = False
+) -> Tuple[List[List[float]], Callable[[int, int], List[int]]]:
+    # Distances between all pairs of nodes, plus a function returning the path of one pair.
+    # Uses the route table or contraction hierarchy when built, the same order as
+    # find_shortest_path, and otherwise one Dijkstra tree per node.
+    route_table = mall.route_table
+    if route_table is not None and route_table.covers(nodes):
+        matrix = [[route_table.distance(source, target, accessibility_required) for target in nodes] for source in nodes]
+        return matrix, lambda source, target: route_table.route([source], [target], accessibility_required)
+
+    hierarchies = mall.contraction_hierarchies
+    if hierarchies is not None and accessibility_required in hierarchies:
+        hierarchy = hierarchies[accessibility_required]
+        return hierarchy.many_to_many(nodes, nodes), lambda source, target: hierarchy.query([source], [target])[1]
+
+    predecessors: Dict[int, List[int]] = {}
+    matrix = []
+    for source in nodes:
+        distance, predecessors[source] = shortest_path_tree(graph, [source], accessibility_required, nodes)
+        matrix.append([distance[target] for target in nodes])
+
+    def leg(source: int, target: int) -> List[int]:
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[source][path[-1]])
+        path.reverse()
+        return path
+
+    return matrix, leg
+
+def sequence_cost(matrix: List[List[float]], sequence: List[int]) -> float:
+    return sum(matrix[source][target] for source, target in zip(sequence, sequence[1:]))
+
+def held_karp(
+    matrix: List[List[float]],
+    stop_groups: List[List[int]],
+    start_group: Optional[List[int]] = None,
+    end_group: Optional[List[int]] = None
+) -> List[int]:
+    # Exact dynamic programme over subsets of stops. best[(mask, vertex)] is the cheapest walk
+    # that visits the stops in mask and ends at vertex, a vertex of one of those stops.
+    # Returns the vertex sequence, including the chosen start and end vertices.
+    inf = float('inf')
+    best: Dict[Tuple[int, int], float] = {}
+    parent: Dict[Tuple[int, int], Optional[int]] = {}
+    start_parent: Dict[int, int] = {}  # first stop vertex: start vertex before it
+    for stop, group in enumerate(stop_groups):
+        for vertex in group:
+            cost = 0.0
+            if start_group is not None:
+                start_vertex = min(start_group, key=lambda start: matrix[start][vertex])
+                cost = matrix[start_vertex][vertex]
+                start_parent[vertex] = start_vertex
+            best[(1 << stop, vertex)] = cost
+            parent[(1 << stop, vertex)] = None
+
+    stop_count = len(stop_groups)
+    vertex_stop = {vertex: stop for stop, group in enumerate(stop_groups) for vertex in group}
+    for mask in range(1, 1 << stop_count):
+        ends = [(vertex, best[(mask, vertex)]) for stop in range(stop_count) if mask >> stop & 1
+                for vertex in stop_groups[stop] if (mask, vertex) in best]
+        for stop in range(stop_count):
+            if mask >> stop & 1:
+                continue
+            next_mask = mask | 1 << stop
+            for vertex in stop_groups[stop]:
+                row_best = best.get((next_mask, vertex), inf)
+                row_parent = None
+                for previous, cost in ends:
+                    cost += matrix[previous][vertex]
+                    if cost < row_best:
+                        row_best = cost
+                        row_parent = previous
+                if row_parent is not None:
+                    best[(next_mask, vertex)] = row_best
+                    parent[(next_mask, vertex)] = row_parent
+
+    full = (1 << stop_count) - 1
+    final_cost = inf
+    final = None  # (last stop vertex, end vertex or None)
+    for vertex in vertex_stop:
+        if (full, vertex) not in best:
+            continue
+        cost = best[(full, vertex)]
+        end_vertex = None
+        if end_group is not None:
+            end_vertex = min(end_group, key=lambda end: matrix[vertex][end])
+            cost += matrix[vertex][end_vertex]
+        if final is None or cost < final_cost:
+            final_cost = cost
+            final = (vertex, end_vertex)
+
+    if final is None and stop_groups:
+        # Some stop cannot be reached from the others; any order costs inf
+        groups = ([start_group] if start_group else []) + stop_groups + ([end_group] if end_group else [])
+        return [group[0] for group in groups]
+    if final is None:
+        # No free stops: straight from start to end
+        start_vertex, end_vertex = min(
+            ((start, end) for start in start_group or [None] for end in end_group or [None]),
+            key=lambda pair: matrix[pair[0]][pair[1]] if None not in pair else 0
+        )
+        return [vertex for vertex in (start_vertex, end_vertex) if vertex is not None]
+
+    vertex, end_vertex = final
+    sequence = [] if end_vertex is None else [end_vertex]
+    mask = full
+    while vertex is not None:
+        sequence.append(vertex)
+        previous = parent[(mask, vertex)]
+        mask &= ~(1 << vertex_stop[vertex])
+        vertex = previous
+    if start_group is not None:
+        sequence.append(start_parent[sequence[-1]])
+    sequence.reverse()
+    return sequence
+
+def nearest_neighbour_two_opt(
+    matrix: List[List[float]],
+    stop_groups: List[List[int]],
+    start_group: Optional[List[int]] = None,
+    end_group: Optional[List[int]] = None
+) -> List[int]:
+    # Greedy tours from every possible first vertex, each improved by 2-opt segment reversals
+    # (costs are recomputed in full since one-way connectors make the matrix asymmetric),
+    # with the vertex of each stop re-chosen for the final order. Returns the best sequence.
+    groups = ([start_group] if start_group is not None else []) + stop_groups + ([end_group] if end_group is not None else [])
+    fixed_start = start_group is not None
+    fixed_end = end_group is not None
+    first_groups = [start_group] if fixed_start else stop_groups
+
+    best_sequence = None
+    best_cost = float('inf')
+    for first_group in first_groups:
+        for first in first_group:
+            # Nearest neighbour over the free stops
+            remaining = [group for group in stop_groups if group is not first_group]
+            order = [first_group]
+            current = first
+            while remaining:
+                group, current = min(
+                    ((group, vertex) for group in remaining for vertex in group),
+                    key=lambda item: matrix[current][item[1]]
+                )
+                remaining.remove(group)
+                order.append(group)
+            if fixed_end:
+                order.append(end_group)
+
+            order = _two_opt(matrix, order, 1 if fixed_start else 0, len(order) - (1 if fixed_end else 0))
+            sequence = _choose_vertices(matrix, order)
+            cost = sequence_cost(matrix, sequence)
+            if best_sequence is None or cost < best_cost:
+                best_sequence, best_cost = sequence, cost
+    return best_sequence if best_sequence is not None else [vertex for group in groups for vertex in group[:1]]
+
+def _two_opt(matrix: List[List[float]], order: List[List[int]], low: int, high: int) -> List[List[int]]:
+    # Reverse segments order[i:j] within [low, high) while that shortens the tour, costing each
+    # group at the vertices _choose_vertices picks
+    best_cost = sequence_cost(matrix, _choose_vertices(matrix, order))
+    improved = True
+    while improved:
+        improved = False
+        for i in range(low, high - 1):
+            for j in range(i + 2, high + 1):
+                candidate = order[:i] + order[i:j][::-1] + order[j:]
+                cost = sequence_cost(matrix, _choose_vertices(matrix, candidate))
+                if cost < best_cost - 1e-9:
+                    order, best_cost = candidate, cost
+                    improved = True
+    return order
+
+def _choose_vertices(matrix: List[List[float]], order: List[List[int]]) -> List[int]:
+    # Cheapest vertex for each group of a fixed order, by dynamic programming along the order
+    costs = {vertex: 0.0 for vertex in order[0]}
+    parents: List[Dict[int, int]] = []
+    for group in order[1:]:
+        next_costs = {}
+        parent = {}
+        for vertex in group:
+            previous = min(costs, key=lambda node: costs[node] + matrix[node][vertex])
+            next_costs[vertex] = costs[previous] + matrix[previous][vertex]
+            parent[vertex] = previous
+        costs = next_costs
+        parents.append(parent)
+    vertex = min(costs, key=costs.get)
+    sequence = [vertex]
+    for parent in reversed(parents):
+        vertex = parent[vertex]
+        sequence.append(vertex)
+    sequence.reverse()
+    return sequence
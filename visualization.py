@@ -1,181 +1,144 @@
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.lines import Line2D
 from mpl_toolkits.mplot3d import Axes3D, art3d
-from typing import Optional, List, Dict
-from models import Mall, Shop, Connector, CorridorNode
+from typing import Optional, List, Tuple
+from models import Mall
+from compiled_graph import get_compiled_graph
 import numpy as np
 
-def visualize_mall(mall: Mall, path: Optional[List[str]] = None):
+# Scene layout and colours, shared with the off-screen renderer in route_render.py
+FLOOR_HEIGHT = 50  # Height of each floor in Z-axis units
+FLOOR_SIZE = 200  # Size of the floor plane
+FLOOR_COLORS = ['#e6f2ff', '#ffe6e6', '#e6ffe6', '#f9e6ff', '#ffffe6']
+SHOP_COLOR = 'green'
+CORRIDOR_COLOR = 'gray'
+CORRIDOR_NODE_COLOR = 'orange'
+CONNECTOR_COLOR_ACCESSIBLE = 'blue'
+CONNECTOR_COLOR_INACCESSIBLE = 'red'
+PATH_COLOR = 'red'
+
+def visualize_mall(
+    mall: Mall,
+    path: Optional[List[str]] = None,
+    distance_field: Optional[np.ndarray] = None,
+    output: Optional[str] = None,
+    show: bool = True
+):
+    # distance_field: per-node values indexed like the compiled graph, e.g. from
+    # distance_field.distance_field; corridor nodes are coloured by it, unreachable ones in grey.
+    # output: file to save the figure to (format from its extension); show: open a window.
     # Create a 3D figure and axis
     fig = plt.figure(figsize=(12, 10))
     ax = fig.add_subplot(111, projection='3d')
+    draw_scene(ax, mall, distance_field)
 
-    # Define floor height
-    floor_height = 50  # Height of each floor in Z-axis units
-
-    # Store texts for adjustment
-    texts = []
+    # Highlight the path
+    if path:
+        xs, ys, zs = route_coordinates(mall, path)
+        if xs:
+            ax.plot(xs, ys, zs, color=PATH_COLOR, linewidth=3)
 
-    # Define colors for different elements
-    floor_colors = ['#e6f2ff', '#ffe6e6', '#e6ffe6', '#f9e6ff', '#ffffe6']
-    shop_color = 'green'
-    corridor_color = 'gray'
-    connector_color_accessible = 'blue'
-    connector_color_inaccessible = 'red'
+    plt.tight_layout()
+    if output is not None:
+        fig.savefig(output)
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+def draw_scene(ax, mall: Mall, distance_field: Optional[np.ndarray] = None):
+    # Floors, shops, corridors and connectors of every floor, plus labels, limits and legend.
+    # Each kind of geometry is drawn as one collection rather than one artist per shop or edge.
+    shop_faces = []
+    corridor_segments = []
+    corridor_points = []
+    field_points = []  # (x, y, z, value) of coloured corridor nodes
+    unreached_points = []  # (x, y, z) of corridor nodes the field does not reach
+    connector_points = {}  # (marker, color): [(x, y, z)]
+    if distance_field is not None:
+        graph = get_compiled_graph(mall)
 
-    # Iterate over each floor
     for floor_level, floor in mall.floors.items():
-        z_base = floor_level * floor_height
-
-        # Draw floor plane (optional)
-        floor_size = 200  # Size of the floor plane
-        xx, yy = np.meshgrid(
-            np.linspace(0, floor_size, 2),
-            np.linspace(0, floor_size, 2)
-        )
-        zz = np.full_like(xx, z_base)
-        ax.plot_surface(xx, yy, zz, color=floor_colors[floor_level % len(floor_colors)], alpha=0.2)
+        z_base = floor_level * FLOOR_HEIGHT
+        xx, yy = np.meshgrid(np.linspace(0, FLOOR_SIZE, 2), np.linspace(0, FLOOR_SIZE, 2))
+        ax.plot_surface(xx, yy, np.full_like(xx, z_base), color=FLOOR_COLORS[floor_level % len(FLOOR_COLORS)], alpha=0.2)
+        ax.text(-20, -20, z_base + FLOOR_HEIGHT / 2, f'Floor {floor_level}', fontsize=12, rotation=90, verticalalignment='center')
 
-        # Add floor label
-        ax.text(
-            -20,
-            -20,
-            z_base + floor_height / 2,
-            f'Floor {floor_level}',
-            fontsize=12,
-            rotation=90,
-            verticalalignment='center'
-        )
-
-        # Draw shops as cuboids
+        # Shops as cuboids, with the default size unless the shop has its own
         for shop in floor.shops.values():
-            x = shop.x
-            y = shop.y
-            z = z_base
-            width = getattr(shop, 'width', 20)  # Default width
-            depth = getattr(shop, 'depth', 15)  # Default depth
-            height = getattr(shop, 'height', floor_height / 2)  # Default height
-
-            # Define cuboid vertices
-            cuboid = get_cuboid_data(
-                x - width / 2,
-                y - depth / 2,
-                z,
-                width,
-                depth,
-                height
-            )
-            # Create 3D polygon and add to plot
-            ax.add_collection3d(art3d.Poly3DCollection(
-                cuboid,
-                facecolors=shop_color,
-                edgecolors='black',
-                linewidths=0.5,
-                alpha=0.7
-            ))
+            width = shop.width if shop.width is not None else 20
+            depth = shop.depth if shop.depth is not None else 15
+            height = shop.height if shop.height is not None else FLOOR_HEIGHT / 2
+            shop_faces.extend(get_cuboid_data(shop.x - width / 2, shop.y - depth / 2, z_base, width, depth, height))
+            ax.text(shop.x, shop.y, z_base + height + 2, shop.name, fontsize=8, ha='center', va='bottom')
 
-            # Add shop name
-            ax.text(
-                x,
-                y,
-                z + height + 2,
-                shop.name,
-                fontsize=8,
-                ha='center',
-                va='bottom'
-            )
-
-        # Draw corridors as lines
         for corridor in floor.corridors.values():
             for node in corridor.nodes:
-                x = node.x
-                y = node.y
-                z = z_base
-                # Draw corridor nodes as small spheres
-                ax.scatter(x, y, z, color='orange', s=20)
-                # Add connections
+                if distance_field is None:
+                    corridor_points.append((node.x, node.y, z_base))
+                else:
+                    value = distance_field[graph.index[mall.get_node_id(node)]]
+                    if np.isfinite(value):
+                        field_points.append((node.x, node.y, z_base, value))
+                    else:
+                        unreached_points.append((node.x, node.y, z_base))
                 for connected_node in node.connections:
-                    x2 = connected_node.x
-                    y2 = connected_node.y
-                    z2 = z_base
-                    ax.plot(
-                        [x, x2],
-                        [y, y2],
-                        [z, z2],
-                        color=corridor_color,
-                        linewidth=2
-                    )
+                    corridor_segments.append([(node.x, node.y, z_base), (connected_node.x, connected_node.y, z_base)])
 
-        # Draw connectors
         for connector in floor.connectors.values():
-            x = connector.x
-            y = connector.y
-            z = z_base
-            color = connector_color_accessible if connector.accessible else connector_color_inaccessible
-            shape = 's' if connector.connector_type == 'elevator' else '^'
-            ax.scatter(x, y, z, marker=shape, color=color, s=50)
-            # Add connector name
-            ax.text(
-                x,
-                y,
-                z + 5,
-                connector.name,
-                fontsize=8,
-                ha='center',
-                va='bottom'
-            )
+            color = CONNECTOR_COLOR_ACCESSIBLE if connector.accessible else CONNECTOR_COLOR_INACCESSIBLE
+            marker = 's' if connector.connector_type == 'elevator' else '^'
+            connector_points.setdefault((marker, color), []).append((connector.x, connector.y, z_base))
+            ax.text(connector.x, connector.y, z_base + 5, connector.name, fontsize=8, ha='center', va='bottom')
+
+    if shop_faces:
+        ax.add_collection3d(art3d.Poly3DCollection(
+            shop_faces, facecolors=SHOP_COLOR, edgecolors='black', linewidths=0.5, alpha=0.7
+        ))
+    if corridor_segments:
+        ax.add_collection3d(art3d.Line3DCollection(corridor_segments, colors=CORRIDOR_COLOR, linewidths=2))
+    if corridor_points:
+        ax.scatter(*zip(*corridor_points), color=CORRIDOR_NODE_COLOR, s=20)
+    # Colour corridor nodes by the distance field, all floors on one colour scale
+    if field_points:
+        xs, ys, zs, values = zip(*field_points)
+        field_scatter = ax.scatter(xs, ys, zs, c=values, cmap='viridis', s=30)
+        ax.figure.colorbar(field_scatter, ax=ax, shrink=0.6, label='Distance')
+    if unreached_points:
+        ax.scatter(*zip(*unreached_points), color='lightgray', s=20)
+    for (marker, color), points in connector_points.items():
+        ax.scatter(*zip(*points), marker=marker, color=color, s=50)
 
-    # Highlight the path
-    if path:
-        path_positions = []
-        for node_id in path:
-            entity = mall.get_entity_by_node_id(node_id)
-            if entity:
-                if isinstance(entity, (Shop, CorridorNode)):
-                    floor_level = entity.floor.level
-                    x = entity.x
-                    y = entity.y
-                    z = floor_level * floor_height
-                elif isinstance(entity, Connector):
-                    floor_level = int(node_id.split(' @ Level ')[-1])
-                    x = entity.x
-                    y = connector.y
-                    z = floor_level * floor_height
-                else:
-                    continue
-                path_positions.append((x, y, z))
-        if path_positions:
-            xs, ys, zs = zip(*path_positions)
-            ax.plot(xs, ys, zs, color='red', linewidth=3)
-
-    # Set labels and title
     ax.set_xlabel('X')
     ax.set_ylabel('Y')
     ax.set_zlabel('Z (Floor Level)')
     ax.set_title('3D Mall Navigation Path')
-
-    # Adjust the view angle for better visualization
     ax.view_init(elev=20, azim=-60)
-
-    # Set plot limits
-    max_floor = max(mall.floors.keys())
-    ax.set_xlim(0, 200)
-    ax.set_ylim(0, 200)
-    ax.set_zlim(0, (max_floor + 1) * floor_height)
-
-    # Add legend
-    shop_patch = patches.Patch(color=shop_color, label='Shop')
-    corridor_patch = patches.Patch(color='orange', label='Corridor Node')
-    connector_patch_accessible = patches.Patch(color=connector_color_accessible, label='Accessible Connector')
-    connector_patch_inaccessible = patches.Patch(color=connector_color_inaccessible, label='Inaccessible Connector')
-    path_line = plt.Line2D([0], [0], color='red', lw=3, label='Shortest Path')
+    ax.set_xlim(0, FLOOR_SIZE)
+    ax.set_ylim(0, FLOOR_SIZE)
+    ax.set_zlim(0, (max(mall.floors.keys(), default=0) + 1) * FLOOR_HEIGHT)
     ax.legend(
-        handles=[shop_patch, corridor_patch, connector_patch_accessible, connector_patch_inaccessible, path_line],
+        handles=[
+            patches.Patch(color=SHOP_COLOR, label='Shop'),
+            patches.Patch(color=CORRIDOR_NODE_COLOR, label='Corridor Node'),
+            patches.Patch(color=CONNECTOR_COLOR_ACCESSIBLE, label='Accessible Connector'),
+            patches.Patch(color=CONNECTOR_COLOR_INACCESSIBLE, label='Inaccessible Connector'),
+            Line2D([0], [0], color=PATH_COLOR, lw=3, label='Shortest Path'),
+        ],
         loc='upper right'
     )
 
-    plt.tight_layout()
-    plt.show()
+def route_coordinates(mall: Mall, path: List[str]) -> Tuple[List[float], List[float], List[float]]:
+    # Scene coordinates of each node on path, read from the compiled graph; node IDs the graph
+    # does not know are skipped
+    graph = get_compiled_graph(mall)
+    nodes = [graph.index[node_id] for node_id in path if node_id in graph.index]
+    return (
+        [graph.xs[node] for node in nodes],
+        [graph.ys[node] for node in nodes],
+        [graph.levels[node] * FLOOR_HEIGHT for node in nodes]
+    )
 
 def get_cuboid_data(x, y, z, dx, dy, dz):
     # Returns vertices of a cuboid
@@ -0,0 +1,177 @@
+import bisect
+import json
+import numpy as np
+from array import array
+from datetime import datetime, time as time_of_day
+from typing import List, Dict, Tuple, Optional, Union
+from models import Mall, Connector
+from compiled_graph import CompiledGraph
+
+class WeightLayer:
+    # Congestion adjustments on top of the weights the graph was built with:
+    #   weight = built weight x multiplier + wait
+    # Multipliers apply to single edges or to every vertical edge of a connector; waits are added
+    # to each vertical edge of a connector, i.e. once per ride, in the same units as the weights.
+    # Adjustments are kept by node ID and connector name so that they survive build_graph.
+    # Multipliers below 1 and negative waits are rejected: edges may only get longer than built,
+    # which keeps the A* floor term and landmark bounds admissible.
+    def __init__(self, mall: Mall):
+        self.mall = mall
+        self.edge_multipliers: Dict[Tuple[str, str], float] = {}  # (node_id, connected_node_id): multiplier
+        self.connector_multipliers: Dict[str, float] = {}  # connector name: multiplier
+        self.connector_waits: Dict[str, float] = {}  # connector name: wait per ride
+        self._graph: Optional[CompiledGraph] = None
+        self._connector_edges: Dict[str, np.ndarray] = {}  # connector name: vertical edge indices in _graph
+
+    def update(
+        self,
+        edge_multipliers: Optional[Dict[Tuple[str, str], float]] = None,
+        connector_multipliers: Optional[Dict[str, float]] = None,
+        connector_waits: Optional[Dict[str, float]] = None,
+        replace: bool = False
+    ):
+        # Merge the given adjustments (or with replace, swap them in for the current ones) and
+        # write the resulting weights to the compiled graph in one pass
+        for (from_id, to_id), value in (edge_multipliers or {}).items():
+            if to_id not in self.mall._connected_node_ids(from_id):
+                raise ValueError(f"Unknown edge {from_id} -> {to_id}")
+            _check_multiplier(value)
+        for name, value in (connector_multipliers or {}).items():
+            self.mall._get_connector(name)
+            _check_multiplier(value)
+        for name, value in (connector_waits or {}).items():
+            self.mall._get_connector(name)
+            if value < 0:
+                raise ValueError(f"Wait for {name} must not be negative, got {value}")
+        if replace:
+            self.edge_multipliers.clear()
+            self.connector_multipliers.clear()
+            self.connector_waits.clear()
+        self.edge_multipliers.update(edge_multipliers or {})
+        self.connector_multipliers.update(connector_multipliers or {})
+        self.connector_waits.update(connector_waits or {})
+        self.apply()
+
+    def clear(self):
+        self.update(replace=True)
+
+    def adjusted_weights(self, graph: CompiledGraph) -> np.ndarray:
+        multipliers = np.ones(graph.edge_count)
+        waits = np.zeros(graph.edge_count)
+        connector_edges = self._get_connector_edges(graph)
+        for name, multiplier in self.connector_multipliers.items():
+            multipliers[connector_edges.get(name, [])] = multiplier
+        for name, wait in self.connector_waits.items():
+            waits[connector_edges.get(name, [])] = wait
+        for (from_id, to_id), multiplier in self.edge_multipliers.items():
+            # Edges removed by a later build_graph are skipped
+            node, neighbor = graph.index.get(from_id), graph.index.get(to_id)
+            if node is None or neighbor is None:
+                continue
+            multipliers[graph.find_edges(node, neighbor)] = multiplier
+        return np.frombuffer(graph.base_weights, dtype=np.float64) * multipliers + waits
+
+    def apply_to(self, graph: CompiledGraph) -> Tuple[np.ndarray, np.ndarray]:
+        # Write the adjusted weights into graph, keeping disabled edges at inf.
+        # Returns the indices of the edges whose weight changed, and their previous weights.
+        adjusted = self.adjusted_weights(graph)
+        current = np.frombuffer(graph.weights, dtype=np.float64)
+        weights = np.where(np.isinf(current), np.inf, adjusted)
+        changed = np.flatnonzero(weights != current)
+        previous = current[changed]
+        graph.adjusted_weights = array('d', adjusted.tobytes())
+        if graph.weights is graph.base_weights:
+            # The built weights may be a read-only map of a compiled file
+            graph.weights = array('d', weights.tobytes())
+        else:
+            np.frombuffer(graph.weights, dtype=np.float64)[:] = weights
+        return changed, previous
+
+    def apply(self):
+        # Patch the mall's compiled graph in place and drop only the cached results that
+        # depend on the changed edges; without a compiled graph the layer applies on compile
+        mall = self.mall
+        mall.graph_version += 1
+        graph = mall.compiled_graph
+        if graph is None:
+            return
+        changed, previous = self.apply_to(graph)
+        if not changed.size:
+            return
+        shortened = bool((np.frombuffer(graph.weights, dtype=np.float64)[changed] < previous).any())
+        sources = np.searchsorted(np.asarray(graph.offsets), changed, side='right') - 1
+        targets = np.asarray(graph.targets)[changed]
+        mall._edges_reweighted(list(zip(sources.tolist(), targets.tolist())), shortened)
+
+    def _get_connector_edges(self, graph: CompiledGraph) -> Dict[str, np.ndarray]:
+        if self._graph is not graph:
+            edges: Dict[str, List[int]] = {}
+            entities, targets = graph.entities, graph.targets
+            for node in range(graph.node_count):
+                entity = entities[node]
+                if not isinstance(entity, Connector):
+                    continue
+                for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+                    if entities[targets[edge]] is entity:
+                        edges.setdefault(entity.name, []).append(edge)
+            self._connector_edges = {name: np.array(indices, dtype=np.int64) for name, indices in edges.items()}
+            self._graph = graph
+        return self._connector_edges
+
+    def __repr__(self):
+        return (f"WeightLayer with {len(self.edge_multipliers)} edge multipliers, "
+                f"{len(self.connector_multipliers)} connector multipliers, {len(self.connector_waits)} waits")
+
+class WeightSchedule:
+    # Time-bucketed congestion table. Each bucket holds from its start time until the next
+    # bucket's, wrapping around midnight:
+    #   [{"start": "10:00",
+    #     "connectors": {"Escalator1": {"multiplier": 1.5, "wait": 20}},
+    #     "edges": [{"from": "CorridorNode:C1N1 @ Level 1", "to": "CorridorNode:C1N2 @ Level 1", "multiplier": 2}]},
+    #    ...]
+    def __init__(self, buckets: List[dict]):
+        if not buckets:
+            raise ValueError("A weight schedule needs at least one bucket")
+        self.buckets = sorted(buckets, key=lambda bucket: _minutes(bucket['start']))
+        self.starts = [_minutes(bucket['start']) for bucket in self.buckets]
+        self.current: Optional[dict] = None
+
+    def bucket_at(self, when: Union[datetime, time_of_day, str]) -> dict:
+        minute = _minutes(when)
+        return self.buckets[bisect.bisect_right(self.starts, minute) - 1]
+
+    def apply(self, layer: WeightLayer, when: Union[datetime, time_of_day, str]) -> bool:
+        # Switch the layer to the bucket for when; returns False if it was already applied
+        bucket = self.bucket_at(when)
+        if bucket is self.current:
+            return False
+        connectors = bucket.get('connectors', {})
+        layer.update(
+            edge_multipliers={(edge['from'], edge['to']): edge['multiplier'] for edge in bucket.get('edges', [])},
+            connector_multipliers={name: values['multiplier'] for name, values in connectors.items() if 'multiplier' in values},
+            connector_waits={name: values['wait'] for name, values in connectors.items() if 'wait' in values},
+            replace=True
+        )
+        self.current = bucket
+        return True
+
+def get_weight_layer(mall: Mall) -> WeightLayer:
+    layer = mall.weight_layer
+    if layer is None:
+        layer = mall.weight_layer = WeightLayer(mall)
+    return layer
+
+def load_weight_schedule(file_path: str) -> WeightSchedule:
+    with open(file_path, 'r') as f:
+        return WeightSchedule(json.load(f))
+
+def _check_multiplier(value: float):
+    if value < 1:
+        raise ValueError(f"Weight multipliers must be at least 1, got {value}")
+
+def _minutes(when: Union[datetime, time_of_day, str]) -> int:
+    # Minute of the day for a datetime, time or 'HH:MM' string
+    if isinstance(when, str):
+        hours, _, minutes = when.partition(':')
+        return int(hours) * 60 + int(minutes or 0)
+    return when.hour * 60 + when.minute